@@ -234,7 +234,7 @@ import pytest
 from unittest.mock import Mock, patch
 
 from src.fsoa.agent.tools import (
-    fetch_overdue_opportunities, get_system_health, update_task_status
+    fetch_overdue_opportunities, get_system_health
 )
 
 
@@ -273,14 +273,6 @@ class TestAgentToolsComprehensive:
         assert isinstance(health, dict)
         assert 'overall_status' in health
     
-    def test_update_task_status_deprecated(self):
-        """测试已废弃的任务状态更新功能"""
-        # Act - 调用已废弃的函数
-        result = update_task_status(9999, "completed")
-        
-        # Assert - 废弃的函数应该返回False
-        assert result is False
-    
     def test_agent_tools_module_coverage(self):
         """测试Agent工具模块覆盖率"""
         # 导入模块以提升覆盖率
@@ -291,7 +283,7 @@ class TestAgentToolsComprehensive:
         
         # 测试常见函数存在
         functions_to_check = [
-            'fetch_overdue_opportunities', 'get_system_health', 'update_task_status'
+            'fetch_overdue_opportunities', 'get_system_health'
         ]
         
         for func_name in functions_to_check:
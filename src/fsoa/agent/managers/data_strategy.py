@@ -5,6 +5,7 @@
 """
 
 import os
+import time
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any, Tuple
 
@@ -13,9 +14,13 @@ from ...data.database import get_db_manager
 from ...data.metabase import get_metabase_client
 from ...utils.logger import get_logger, log_function_call
 from ...utils.config import get_config
+from ...utils.timezone_utils import now_china_naive
 
 logger = get_logger(__name__)
 
+# 缓存写入时间的检查间隔 - 窗口期内的统计查询复用上次结果，不重复执行聚合查询
+CACHE_FRESHNESS_CHECK_SECONDS = 30
+
 
 class BusinessDataStrategy:
     """业务数据处理策略"""
@@ -29,6 +34,9 @@ class BusinessDataStrategy:
         self.enable_cache = os.getenv("ENABLE_OPPORTUNITY_CACHE", "true").lower() == "true"
         self.cache_ttl_hours = int(os.getenv("CACHE_TTL_HOURS", "1"))
         self.force_refresh = False  # 强制刷新标志
+        self._statistics_snapshot: Optional[Dict[str, Any]] = None  # 随最新数据写入的统计快照
+        self._cache_last_updated: Optional[datetime] = None  # 最近一次查询到的缓存写入时间
+        self._cache_checked_at: Optional[float] = None  # 最近一次查询缓存写入时间的时刻（monotonic）
     
     @log_function_call
     def get_opportunities(self, force_refresh: bool = False) -> List[OpportunityInfo]:
@@ -51,6 +59,9 @@ class BusinessDataStrategy:
             if self.enable_cache:
                 self._full_refresh_cache(fresh_opportunities)
 
+            # 统计快照在缓存写入之后生成，快照时间不早于缓存更新时间
+            self._update_statistics_snapshot(fresh_opportunities)
+
             return fresh_opportunities
 
         except Exception as e:
@@ -58,7 +69,9 @@ class BusinessDataStrategy:
             # 降级策略：尝试从缓存获取（仅在启用缓存时）
             if self.enable_cache:
                 logger.warning("Falling back to cached data due to Metabase failure")
-                return self._get_from_cache_only()
+                cached_opportunities = self._get_from_cache_only()
+                self._update_statistics_snapshot(cached_opportunities)
+                return cached_opportunities
             raise
     
     def _full_refresh_cache(self, opportunities: List[OpportunityInfo]) -> None:
@@ -100,6 +113,72 @@ class BusinessDataStrategy:
             logger.error(f"Failed to fetch from Metabase: {e}")
             raise
     
+    def _update_statistics_snapshot(self, opportunities: List[OpportunityInfo]) -> None:
+        """在获取最新数据的同时计算基本统计，供统计查询直接读取"""
+        overdue_count = 0
+        escalation_count = 0
+        organizations = set()
+        for opp in opportunities:
+            organizations.add(opp.org_name)
+            if opp.is_overdue:
+                overdue_count += 1
+                if opp.escalation_level > 0:
+                    escalation_count += 1
+
+        self._statistics_snapshot = {
+            "total_opportunities": len(opportunities),
+            "overdue_opportunities": overdue_count,
+            "escalation_opportunities": escalation_count,
+            "organizations": len(organizations),
+            "snapshot_time": now_china_naive()
+        }
+
+    def get_statistics_snapshot(self, build_from_cache: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        获取最近一次拉取数据时生成的统计快照
+
+        Args:
+            build_from_cache: 尚无快照或本地缓存比快照更新（如其他进程已刷新）时，
+                基于本地缓存重新生成，不触发Metabase请求；缓存未启用（不查询缓存）
+                或缓存为空时不生成
+
+        Returns:
+            统计快照的副本；尚无快照时返回None，由调用方决定是否拉取数据
+        """
+        if build_from_cache and self.enable_cache:
+            snapshot = self._statistics_snapshot
+            now = time.monotonic()
+            if self._cache_checked_at is None or now - self._cache_checked_at >= CACHE_FRESHNESS_CHECK_SECONDS:
+                self._cache_last_updated = self._get_cache_last_updated()
+                self._cache_checked_at = now
+            cache_updated = self._cache_last_updated
+            if cache_updated and (snapshot is None or cache_updated > snapshot["snapshot_time"]):
+                self._update_statistics_snapshot(self._get_cached_opportunities())
+
+        snapshot = self._statistics_snapshot
+        return dict(snapshot) if snapshot is not None else None
+
+    def _get_cache_last_updated(self) -> Optional[datetime]:
+        """获取本地缓存最近一次写入时间，缓存为空或查询失败时返回None"""
+        try:
+            from sqlalchemy import func
+            from ...data.database import OpportunityCacheTable
+            with self.db_manager.get_session() as session:
+                return session.query(func.max(OpportunityCacheTable.last_updated)).scalar()
+
+        except Exception as e:
+            logger.error(f"Failed to get cache last updated time: {e}")
+            return None
+
+    def _get_cached_opportunities(self) -> List[OpportunityInfo]:
+        """读取本地缓存中的商机数据（7天内），不访问Metabase"""
+        try:
+            return self.db_manager.get_cached_opportunities(24 * 7)
+
+        except Exception as e:
+            logger.error(f"Failed to get cached opportunities: {e}")
+            return []
+
     def _get_from_cache_only(self) -> List[OpportunityInfo]:
         """
         仅从缓存获取数据（降级策略）
@@ -108,7 +187,7 @@ class BusinessDataStrategy:
         """
         try:
             # 获取所有缓存数据，忽略TTL（应急情况下使用任何可用数据）
-            cached_opportunities = self.db_manager.get_cached_opportunities(24 * 7)  # 7天内的缓存
+            cached_opportunities = self._get_cached_opportunities()
             logger.warning(f"Using fallback cache data: {len(cached_opportunities)} opportunities")
             return cached_opportunities
 
@@ -302,6 +381,7 @@ class BusinessDataStrategy:
             else:
                 new_count = 0
                 logger.info("Cache disabled, no data cached")
+            self._update_statistics_snapshot(fresh_opportunities)
 
             # 验证实际的数据库状态
             with self.db_manager.get_session() as session:
@@ -332,7 +412,7 @@ class BusinessDataStrategy:
                 if total_cached > 0:
                     cached_opportunities = self.db_manager.get_cached_opportunities(24 * 365)  # 获取所有缓存
                     overdue_cached = len([opp for opp in cached_opportunities if opp.is_overdue])
-                    organizations = len(set(opp.org_name for opp in cached_opportunities))
+                    organizations = len({opp.org_name for opp in cached_opportunities})
                     last_refresh = max([opp.last_updated for opp in cached_opportunities], default=None)
                 else:
                     overdue_cached = 0
@@ -348,7 +428,7 @@ class BusinessDataStrategy:
                 "last_refresh": last_refresh
             }
 
-            logger.info(f"Cache statistics (full refresh mode): {stats}")
+            logger.info("Cache statistics (full refresh mode): %s", stats)
             return stats
 
         except Exception as e:
@@ -395,7 +475,7 @@ class BusinessDataStrategy:
                 "discrepancies": []
             }
             
-            logger.info(f"Data consistency check: {consistency_report}")
+            logger.info("Data consistency check: %s", consistency_report)
             return consistency_report
             
         except Exception as e:
@@ -26,6 +26,9 @@ class AgentExecutionTracker:
         self.db_manager = get_db_manager()
         self.current_run_id: Optional[int] = None
         self.current_step_start_time: Optional[datetime] = None
+        # 缓冲模式下步骤记录按运行ID暂存内存，运行结束时一次写入；
+        # 追踪器为进程内共享实例，按run_id隔离保证并发运行互不干扰
+        self._buffered_history: Dict[int, List[AgentHistory]] = {}
     
     @log_function_call
     def start_run(self, context: Optional[Dict[str, Any]] = None) -> int:
@@ -120,7 +123,12 @@ class AgentExecutionTracker:
                 error_message=error_message
             )
             
-            success = self.db_manager.save_agent_history(history)
+            buffer = self._buffered_history.get(run_id)
+            if buffer is not None:
+                buffer.append(history)
+                success = True
+            else:
+                success = self.db_manager.save_agent_history(history)
             
             if success:
                 if error_message:
@@ -134,6 +142,17 @@ class AgentExecutionTracker:
             logger.error(f"Failed to log step {step_name}: {e}")
             return False
     
+    @contextmanager
+    def buffered_steps(self, run_id: int):
+        """上下文管理器：缓冲指定运行的步骤记录，退出时批量写入（每次运行一次提交）"""
+        self._buffered_history[run_id] = []
+        try:
+            yield
+        finally:
+            history = self._buffered_history.pop(run_id, None)
+            if history and not self.db_manager.save_agent_histories(history):
+                logger.error(f"Failed to flush {len(history)} buffered step records")
+
     @contextmanager
     def track_step(self, step_name: str, input_data: Optional[Dict[str, Any]] = None):
         """上下文管理器：自动追踪执行步骤"""
@@ -196,7 +215,7 @@ class AgentExecutionTracker:
         """获取运行统计信息"""
         try:
             stats = self.db_manager.get_agent_run_statistics(hours_back)
-            logger.info(f"Retrieved run statistics for last {hours_back} hours: {stats}")
+            logger.info("Retrieved run statistics for last %s hours: %s", hours_back, stats)
             return stats
 
         except Exception as e:
@@ -233,8 +252,7 @@ class AgentExecutionTracker:
         """获取运行详情和步骤历史"""
         try:
             # 获取运行记录
-            runs = self.db_manager.get_agent_runs(limit=1000)  # 获取足够多的记录
-            run = next((r for r in runs if r.id == run_id), None)
+            run = self.db_manager.get_agent_run(run_id)
 
             if not run:
                 logger.warning(f"Run {run_id} not found")
@@ -4,11 +4,12 @@
 负责创建、管理和执行通知任务
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 # 导入时区工具
 from ...utils.timezone_utils import now_china_naive
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 from dataclasses import dataclass
 
 from ...data.models import (
@@ -16,6 +17,7 @@ from ...data.models import (
     NotificationTaskStatus, OpportunityStatus
 )
 from ...data.database import get_db_manager
+from .data_strategy import BusinessDataStrategy
 from ...notification.wechat import get_wechat_client
 from ...notification.business_formatter import BusinessNotificationFormatter
 from ...utils.logger import get_logger, log_function_call
@@ -40,14 +42,16 @@ class NotificationResult:
 class NotificationTaskManager:
     """通知任务管理器"""
     
-    def __init__(self):
+    def __init__(self, data_strategy: Optional[BusinessDataStrategy] = None):
         self.db_manager = get_db_manager()
         self.wechat_client = get_wechat_client()
         self.formatter = BusinessNotificationFormatter()
+        self.data_strategy = data_strategy  # 未注入时在首次需要拉取商机时创建
 
         # 配置参数
         self.notification_cooldown_hours = 2.0  # 通知冷却时间（小时）
         self.max_retry_count = 5  # 最大重试次数
+        self.max_concurrent_sends = 5  # 同时发送通知的组织数上限
 
         # 通知开关配置
         self.reminder_enabled = True  # 默认启用提醒通知
@@ -70,7 +74,8 @@ class NotificationTaskManager:
             self.notification_cooldown_hours = cooldown_minutes / 60.0
 
             self.max_retry_count = int(configs.get("max_retry_count", "5"))
-            # API间隔现在由WeChatClient处理，这里不再需要
+            # API间隔现在由WeChatClient处理（同一Webhook串行），这里只控制跨组织并发
+            self.max_concurrent_sends = max(1, int(configs.get("webhook_max_concurrency", "5")))
 
             # 加载通知开关配置
             self.reminder_enabled = configs.get("notification_reminder_enabled", "true").lower() == "true"
@@ -93,21 +98,29 @@ class NotificationTaskManager:
             created_tasks_tracker = set()
             escalation_orgs = set()  # 🔧 新增：收集需要升级通知的组织
 
+            # 进行中任务（待发送/发送中）与冷却期内已发送通知各只查询一次，逐个商机的去重检查改为集合查找
+            pending_keys = self.db_manager.get_active_notification_keys()
+            now = now_china_naive()  # 整批共用同一时间戳
+            cooldown_cutoff = now - timedelta(hours=self.notification_cooldown_hours)
+            recent_keys = self.db_manager.get_recent_notification_keys(since=cooldown_cutoff)
+            sla_config = self.db_manager.get_all_system_configs()  # SLA阈值配置只读取一次
+
             for opp in opportunities:
                 # 更新商机的计算字段
-                opp.update_overdue_info(use_business_time=True)
+                opp.update_overdue_info(use_business_time=True, sla_config=sla_config)
 
                 # 创建提醒通知任务（4/8小时）→ 服务商群
                 if opp.is_violation and self.reminder_enabled:
                     task_key = (opp.order_num, NotificationTaskType.REMINDER)
                     # 检查数据库中是否已存在 + 检查当前批次中是否已创建
-                    if (not self._has_pending_task(opp.order_num, NotificationTaskType.REMINDER) and
+                    if (not self._has_pending_task(opp.order_num, NotificationTaskType.REMINDER,
+                                                   pending_keys, recent_keys) and
                         task_key not in created_tasks_tracker):
                         reminder_task = NotificationTask(
                             order_num=opp.order_num,
                             org_name=opp.org_name,
                             notification_type=NotificationTaskType.REMINDER,
-                            due_time=now_china_naive(),
+                            due_time=now,
                             created_run_id=run_id,
                             cooldown_hours=self.notification_cooldown_hours,
                             max_retry_count=self.max_retry_count
@@ -154,13 +167,14 @@ class NotificationTaskManager:
                         task_key = (opp.order_num, NotificationTaskType.ESCALATION)
 
                         # 检查该工单是否已有升级任务
-                        if (not self._has_pending_task(opp.order_num, NotificationTaskType.ESCALATION) and
+                        if (not self._has_pending_task(opp.order_num, NotificationTaskType.ESCALATION,
+                                                       pending_keys, recent_keys) and
                             task_key not in created_tasks_tracker):
                             escalation_task = NotificationTask(
                                 order_num=opp.order_num,  # 🚀 重构：使用真实工单号！
                                 org_name=opp.org_name,
                                 notification_type=NotificationTaskType.ESCALATION,
-                                due_time=now_china_naive(),
+                                due_time=now,
                                 created_run_id=run_id,
                                 cooldown_hours=self.notification_cooldown_hours,
                                 max_retry_count=self.max_retry_count
@@ -177,11 +191,12 @@ class NotificationTaskManager:
             else:
                 logger.info("Escalation notifications are disabled, skipping escalation task creation")
 
-            # 批量保存任务
-            for task in tasks:
-                task_id = self.db_manager.save_notification_task(task)
-                task.id = task_id
-                logger.info(f"Created notification task {task_id} for order {task.order_num}")
+            # 批量保存任务（单个事务）
+            if tasks:
+                task_ids = self.db_manager.save_notification_tasks(tasks)
+                for task, task_id in zip(tasks, task_ids):
+                    task.id = task_id
+                    logger.info(f"Created notification task {task_id} for order {task.order_num}")
             
             logger.info(f"Created {len(tasks)} notification tasks")
             return tasks
@@ -191,11 +206,22 @@ class NotificationTaskManager:
             raise
     
     @log_function_call
-    def execute_pending_tasks(self, run_id: int) -> NotificationResult:
-        """执行待处理的通知任务"""
+    def execute_pending_tasks(self, run_id: int,
+                              opportunities: Optional[List[OpportunityInfo]] = None) -> NotificationResult:
+        """执行待处理的通知任务
+
+        Args:
+            run_id: Agent运行ID
+            opportunities: 本次运行已获取的商机，发送时优先使用，避免重复拉取
+        """
         result = NotificationResult()
         
         try:
+            # 先回收租约过期的发送中任务（运行异常退出遗留），再查询待处理任务
+            reclaimed = self.db_manager.reclaim_expired_notification_claims()
+            if reclaimed:
+                logger.warning(f"Reclaimed {reclaimed} notification tasks with expired claims")
+
             # 获取待处理任务
             pending_tasks = self.db_manager.get_pending_notification_tasks()
             result.total_tasks = len(pending_tasks)
@@ -204,8 +230,9 @@ class NotificationTaskManager:
                 logger.info("No pending notification tasks")
                 return result
 
-            # 过滤出应该立即发送的任务（考虑冷静时间）
-            ready_tasks = [task for task in pending_tasks if task.should_send_now()]
+            # 过滤出应该立即发送的任务（考虑冷静时间）- 整批共用同一时间戳
+            now = now_china_naive()
+            ready_tasks = [task for task in pending_tasks if task.should_send_now(now)]
 
             if not ready_tasks:
                 logger.info(f"No tasks ready to send (total pending: {len(pending_tasks)})")
@@ -213,24 +240,50 @@ class NotificationTaskManager:
 
             logger.info(f"Found {len(ready_tasks)} tasks ready to send out of {len(pending_tasks)} pending")
 
+            # 认领任务：并发运行时每个任务只会被一次运行领取，避免重复通知
+            try:
+                claimed_ids = set(self.db_manager.claim_notification_tasks(
+                    [task.id for task in ready_tasks], run_id
+                ))
+            except Exception as e:
+                error_msg = f"Failed to claim notification tasks: {e}"
+                logger.error(error_msg)
+                result.errors.append(error_msg)
+                return result
+            if len(claimed_ids) < len(ready_tasks):
+                logger.info(f"{len(ready_tasks) - len(claimed_ids)} tasks already claimed by another run")
+                ready_tasks = [task for task in ready_tasks if task.id in claimed_ids]
+                if not ready_tasks:
+                    return result
+
             # 按组织分组
             org_tasks = self._group_tasks_by_org(ready_tasks)
 
-            # 执行通知
-            for org_name, tasks in org_tasks.items():
-                try:
-                    org_result = self._send_org_notifications(org_name, tasks, run_id)
+            # 发送前一次性准备所需商机，各批次共用，不在批次内逐个拉取
+            opportunities_by_order = self._load_opportunities_for_orders(
+                {task.order_num for task in ready_tasks}, opportunities
+            )
+
+            try:
+                # 执行通知（不同组织并发发送）
+                for org_name, tasks, org_result in self._dispatch_org_notifications(
+                    org_tasks, run_id, opportunities_by_order
+                ):
+                    if isinstance(org_result, Exception):
+                        error_msg = f"Failed to send notifications to {org_name}: {org_result}"
+                        logger.error(error_msg)
+                        result.errors.append(error_msg)
+                        result.failed_count += len(tasks)
+                        continue
+
                     result.sent_count += org_result.sent_count
                     result.failed_count += org_result.failed_count
                     result.escalated_count += org_result.escalated_count
                     result.errors.extend(org_result.errors)
+            finally:
+                # 未标记为已发送/失败的任务（待重试）回退为PENDING
+                self.db_manager.release_notification_tasks(run_id)
 
-                except Exception as e:
-                    error_msg = f"Failed to send notifications to {org_name}: {e}"
-                    logger.error(error_msg)
-                    result.errors.append(error_msg)
-                    result.failed_count += len(tasks)
-            
             logger.info(f"Notification execution completed: {result.sent_count} sent, {result.failed_count} failed")
             return result
             
@@ -239,27 +292,37 @@ class NotificationTaskManager:
             result.errors.append(str(e))
             return result
     
-    def _has_pending_task(self, order_num: str, notification_type: NotificationTaskType = None) -> bool:
+    def _has_pending_task(self, order_num: str, notification_type: NotificationTaskType = None,
+                          pending_keys: Optional[Set[Tuple[str, NotificationTaskType]]] = None,
+                          recent_keys: Optional[Set[Tuple[str, NotificationTaskType]]] = None) -> bool:
         """检查是否已存在待处理任务或在冷却期内的已发送任务
 
         Args:
             order_num: 工单号或任务标识符
             notification_type: 通知类型，如果指定则只检查该类型的通知
+            pending_keys: 预先查询的待处理任务 (工单号, 通知类型) 集合，批量检查时避免重复查询
+            recent_keys: 预先查询的冷却期内已发送通知 (工单号, 通知类型) 集合，批量检查时避免重复查询
         """
         try:
-            # 检查是否有待处理任务
-            pending_tasks = self.db_manager.get_pending_notification_tasks()
+            # 检查是否有进行中任务（待发送或已被某次运行认领发送中）
+            if pending_keys is None:
+                pending_keys = self.db_manager.get_active_notification_keys()
             if notification_type:
-                # 检查特定类型的待处理任务
-                if any(task.order_num == order_num and task.notification_type == notification_type
-                       for task in pending_tasks):
+                # 检查特定类型的进行中任务
+                if (order_num, notification_type) in pending_keys:
                     return True
             else:
-                # 检查任意类型的待处理任务（向后兼容）
-                if any(task.order_num == order_num for task in pending_tasks):
+                # 检查任意类型的进行中任务（向后兼容）
+                if any(key_order_num == order_num for key_order_num, _ in pending_keys):
                     return True
 
             # 检查是否在冷却期内已发送过相同类型的通知
+            if recent_keys is not None and notification_type:
+                if (order_num, notification_type) in recent_keys:
+                    logger.info(f"Order {order_num} has recent {notification_type.value} notifications within cooldown period")
+                    return True
+                return False
+
             cooldown_cutoff = now_china_naive() - timedelta(hours=self.notification_cooldown_hours)
 
             if notification_type:
@@ -295,40 +358,110 @@ class NotificationTaskManager:
                 org_tasks[task.org_name] = []
             org_tasks[task.org_name].append(task)
         return org_tasks
-    
-    def _send_org_notifications(self, org_name: str, tasks: List[NotificationTask],
-                              run_id: int) -> NotificationResult:
+
+    def _get_data_strategy(self) -> BusinessDataStrategy:
+        """获取业务数据策略，未注入时创建"""
+        if self.data_strategy is None:
+            self.data_strategy = BusinessDataStrategy()
+        return self.data_strategy
+
+    def _load_opportunities_for_orders(
+        self, order_nums: Set[str], opportunities: Optional[List[OpportunityInfo]] = None
+    ) -> Dict[str, OpportunityInfo]:
+        """准备发送所需的商机，按工单号索引，供本次发送的各批次共用
+
+        优先使用本次运行已获取的商机；仍有缺失时，启用缓存则读取本地缓存（7天内），
+        缓存未启用或未命中时再从数据源统一拉取一次
+        """
+        opportunities_by_order = {opp.order_num: opp for opp in opportunities or []}
+        if order_nums <= opportunities_by_order.keys():
+            return opportunities_by_order
+
+        data_strategy = self._get_data_strategy()
+        if data_strategy.cache_enabled:
+            try:
+                for opp in self.db_manager.get_cached_opportunities(24 * 7):
+                    opportunities_by_order.setdefault(opp.order_num, opp)
+            except Exception as e:
+                logger.error(f"Failed to load cached opportunities for notifications: {e}")
+
+        missing = order_nums - opportunities_by_order.keys()
+        if missing:
+            logger.info(f"Fetching opportunities for {len(missing)} orders not found locally")
+            try:
+                for opp in data_strategy.get_opportunities():
+                    opportunities_by_order.setdefault(opp.order_num, opp)
+            except Exception as e:
+                logger.error(f"Failed to fetch opportunities for notifications: {e}")
+
+        logger.info(f"Loaded {len(opportunities_by_order)} opportunities for notifications")
+        return opportunities_by_order
+
+    def _dispatch_org_notifications(
+        self, org_tasks: Dict[str, List[NotificationTask]], run_id: int,
+        opportunities: Optional[Dict[str, OpportunityInfo]] = None
+    ) -> List[Tuple[str, List[NotificationTask], Union[NotificationResult, Exception]]]:
+        """并发发送各组织通知
+
+        Webhook请求是网络I/O，不同组织的群互不影响，使用有界线程池重叠等待时间；
+        同一Webhook的发送间隔由WeChatClient保证。升级通知（内部运营群）与提醒通知
+        （服务商群）拆成独立批次，提醒不必排在共享运营群的升级发送之后。
+        opportunities在各批次间只读共享，需要重新计算状态时先复制。
+        返回结果保持组织分组顺序。
+        """
+        batches = []
+        for org_name, tasks in org_tasks.items():
+            by_type: Dict[NotificationTaskType, List[NotificationTask]] = {}
+            for task in tasks:
+                by_type.setdefault(task.notification_type, []).append(task)
+            batches.extend((org_name, type_tasks) for type_tasks in by_type.values())
+
+        def send(item):
+            org_name, tasks = item
+            try:
+                return org_name, tasks, self._send_org_notifications(org_name, tasks, run_id, opportunities)
+            except Exception as e:
+                return org_name, tasks, e
+
+        max_workers = min(self.max_concurrent_sends, len(batches))
+        if max_workers <= 1:
+            return [send(item) for item in batches]
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fsoa-notify") as executor:
+            return list(executor.map(send, batches))
+
+    def _send_org_notifications(self, org_name: str, tasks: List[NotificationTask], run_id: int,
+                              opportunities: Optional[Dict[str, OpportunityInfo]] = None) -> NotificationResult:
         """发送组织通知 - 优化版：合并同组织的所有通知为一条消息"""
         result = NotificationResult()
 
         try:
-            # 分离不同类型的通知
-            reminder_tasks = [t for t in tasks if t.notification_type == NotificationTaskType.REMINDER]
-            escalation_tasks = [t for t in tasks if t.notification_type == NotificationTaskType.ESCALATION]
+            # 分离不同类型的通知（单次遍历）
+            reminder_tasks = []
+            escalation_tasks = []
+            for t in tasks:
+                if t.notification_type == NotificationTaskType.REMINDER:
+                    reminder_tasks.append(t)
+                elif t.notification_type == NotificationTaskType.ESCALATION:
+                    escalation_tasks.append(t)
 
             # 发送升级通知到内部运营群
             if escalation_tasks:
-                success = self._send_escalation_notification(org_name, escalation_tasks, run_id)
+                success = self._send_escalation_notification(org_name, escalation_tasks, run_id, opportunities)
                 if success:
                     result.escalated_count += len(escalation_tasks)
-                    for task in escalation_tasks:
-                        self._update_task_after_send(task, run_id, success=True)
                 else:
                     result.failed_count += len(escalation_tasks)
-                    for task in escalation_tasks:
-                        self._update_task_after_send(task, run_id, success=False)
+                self._update_tasks_after_send(escalation_tasks, run_id, success)
 
             # 发送提醒通知到服务商群
             if reminder_tasks:
-                success = self._send_reminder_notification(org_name, reminder_tasks, run_id)
+                success = self._send_reminder_notification(org_name, reminder_tasks, run_id, opportunities)
                 if success:
                     result.sent_count += len(reminder_tasks)
-                    for task in reminder_tasks:
-                        self._update_task_after_send(task, run_id, success=True)
                 else:
                     result.failed_count += len(reminder_tasks)
-                    for task in reminder_tasks:
-                        self._update_task_after_send(task, run_id, success=False)
+                self._update_tasks_after_send(reminder_tasks, run_id, success)
             
             return result
             
@@ -339,9 +472,13 @@ class NotificationTaskManager:
             return result
     
     def _format_notification_message(self, org_name: str, tasks: List[NotificationTask],
-                                   notification_type: NotificationTaskType) -> str:
+                                   notification_type: NotificationTaskType,
+                                   opportunities: Optional[Dict[str, OpportunityInfo]] = None) -> str:
         """格式化通知消息"""
         try:
+            if opportunities is None:
+                opportunities = self._load_opportunities_for_orders({task.order_num for task in tasks})
+
             # 🔧 修复：获取商机信息并按工单号去重，确保每个工单都能正确获取到信息
             opportunities_dict = {}
             missing_order_nums = []
@@ -349,7 +486,7 @@ class NotificationTaskManager:
             for task in tasks:
                 if task.order_num not in opportunities_dict:
                     # 获取商机信息
-                    opp_info = self._get_opportunity_info_for_notification(task)
+                    opp_info = self._get_opportunity_info_for_notification(task, opportunities)
                     if opp_info:
                         opportunities_dict[task.order_num] = opp_info
                         logger.debug(f"Successfully got opportunity info for {task.order_num}")
@@ -361,29 +498,29 @@ class NotificationTaskManager:
             if missing_order_nums:
                 logger.warning(f"Missing opportunity info for order numbers: {missing_order_nums}")
 
-            opportunities = list(opportunities_dict.values())
+            message_opportunities = list(opportunities_dict.values())
 
             # 确保至少有一个商机信息用于格式化
-            if not opportunities:
+            if not message_opportunities:
                 logger.error(f"No opportunity info available for tasks: {[t.order_num for t in tasks]}")
                 # 创建基础信息用于通知
                 for task in tasks:
-                    opportunities.append(self._create_fallback_opportunity_info(task))
+                    message_opportunities.append(self._create_fallback_opportunity_info(task))
 
-            logger.info(f"Formatting message for {len(opportunities)} opportunities in org {org_name}")
+            logger.info(f"Formatting message for {len(message_opportunities)} opportunities in org {org_name}")
 
             if self.use_llm_formatting and self.llm_client:
                 # 使用LLM格式化
-                return self._format_with_llm(org_name, opportunities, notification_type)
+                return self._format_with_llm(org_name, message_opportunities, notification_type)
             else:
                 # 使用标准模板
-                return self._format_with_template(org_name, opportunities, notification_type)
+                return self._format_with_template(org_name, message_opportunities, notification_type)
 
         except Exception as e:
             logger.error(f"Failed to format message: {e}")
             # 降级到标准模板 - 使用简化的商机信息
-            opportunities = [self._get_opportunity_info_for_notification(tasks[0])] if tasks else []
-            return self._format_with_template(org_name, opportunities, notification_type)
+            message_opportunities = [self._get_opportunity_info_for_notification(tasks[0], opportunities)] if tasks else []
+            return self._format_with_template(org_name, message_opportunities, notification_type)
     
     def _format_with_llm(self, org_name: str, opportunities: List[OpportunityInfo],
                         notification_type: NotificationTaskType) -> str:
@@ -461,10 +598,7 @@ class NotificationTaskManager:
             message = self._format_notification_message(org_name, tasks, NotificationTaskType.STANDARD)
 
             # 保存消息内容到任务记录中
-            for task in tasks:
-                if not task.message:  # 只在首次发送时保存消息
-                    task.message = message
-                    self.db_manager.update_notification_task_message(task.id, message)
+            self._save_tasks_message(tasks, message)
 
             # 发送到组织对应的企微群
             success = self.wechat_client.send_notification_to_org(
@@ -484,18 +618,17 @@ class NotificationTaskManager:
             logger.error(f"Failed to send standard notification to {org_name}: {e}")
             return False
 
-    def _send_reminder_notification(self, org_name: str, tasks: List[NotificationTask],
-                                  run_id: int) -> bool:
+    def _send_reminder_notification(self, org_name: str, tasks: List[NotificationTask], run_id: int,
+                                  opportunities: Optional[Dict[str, OpportunityInfo]] = None) -> bool:
         """发送提醒通知（4/8小时）→ 服务商群"""
         try:
             # 格式化消息
-            message = self._format_notification_message(org_name, tasks, NotificationTaskType.REMINDER)
+            message = self._format_notification_message(
+                org_name, tasks, NotificationTaskType.REMINDER, opportunities
+            )
 
             # 保存消息内容到任务记录中
-            for task in tasks:
-                if not task.message:  # 只在首次发送时保存消息
-                    task.message = message
-                    self.db_manager.update_notification_task_message(task.id, message)
+            self._save_tasks_message(tasks, message)
 
             # 发送到组织对应的企微群
             success = self.wechat_client.send_notification_to_org(
@@ -515,8 +648,8 @@ class NotificationTaskManager:
             logger.error(f"Failed to send reminder notification to {org_name}: {e}")
             return False
     
-    def _send_escalation_notification(self, org_name: str, tasks: List[NotificationTask],
-                                    run_id: int) -> bool:
+    def _send_escalation_notification(self, org_name: str, tasks: List[NotificationTask], run_id: int,
+                                    opportunities: Optional[Dict[str, OpportunityInfo]] = None) -> bool:
         """发送升级通知 - 🚀 重构版本：基于工单级任务聚合发送"""
         try:
             # 🚀 重构：从工单级任务中获取需要升级的工单号
@@ -524,12 +657,15 @@ class NotificationTaskManager:
             logger.info(f"Sending escalation notification for org {org_name} with orders: {order_nums}")
 
             # 🚀 重构：根据工单号获取对应的商机详情
-            escalation_opportunities = self._get_opportunities_by_order_nums(order_nums)
+            escalation_opportunities = self._get_opportunities_by_order_nums(order_nums, opportunities)
 
             # 过滤出仍然需要升级的商机（实时验证）
             current_escalation_opportunities = []
+            sla_config = self.db_manager.get_all_system_configs()
             for opp in escalation_opportunities:
-                opp.update_overdue_info(use_business_time=True)
+                # 商机在并发批次间共享，复制后再重新计算状态
+                opp = opp.model_copy()
+                opp.update_overdue_info(use_business_time=True, sla_config=sla_config)
                 if opp.escalation_level > 0:
                     current_escalation_opportunities.append(opp)
 
@@ -542,10 +678,7 @@ class NotificationTaskManager:
             message = self.formatter.format_escalation_notification(org_name, current_escalation_opportunities)
 
             # 保存消息内容到任务记录中
-            for task in tasks:
-                if not task.message:  # 只在首次发送时保存消息
-                    task.message = message
-                    self.db_manager.update_notification_task_message(task.id, message)
+            self._save_tasks_message(tasks, message)
 
             # 发送到内部运营群
             success = self.wechat_client.send_notification_to_org(
@@ -565,57 +698,16 @@ class NotificationTaskManager:
             logger.error(f"Failed to send escalation notification for {org_name}: {e}")
             return False
 
-    def _get_all_escalation_opportunities_for_org(self, org_name: str) -> List[OpportunityInfo]:
-        """获取该组织所有需要升级的商机 - 修复版：确保数据一致性"""
-        try:
-            # 🔧 修复：强制刷新数据，确保获取最新状态
-            all_opportunities = self.data_strategy.get_opportunities(force_refresh=True)
-
-            # 筛选出该组织需要升级的商机
-            escalation_opportunities = []
-            for opp in all_opportunities:
-                if opp.org_name == org_name:
-                    # 重新计算商机的状态，确保使用最新的时间
-                    opp.update_overdue_info(use_business_time=True)
-
-                    # 检查是否需要升级
-                    if opp.escalation_level > 0:
-                        escalation_opportunities.append(opp)
-                        logger.debug(f"Escalation opportunity: {opp.order_num}, elapsed={opp.elapsed_hours:.1f}h, level={opp.escalation_level}")
-
-            logger.info(f"Found {len(escalation_opportunities)} escalation opportunities for org {org_name}")
-
-            # 🔧 新增：按工单号排序，确保消息内容的一致性
-            escalation_opportunities.sort(key=lambda x: x.order_num)
-
-            return escalation_opportunities
-
-        except Exception as e:
-            logger.error(f"Failed to get escalation opportunities for org {org_name}: {e}")
-            return []
-
     def _has_pending_escalation_task_for_org(self, org_name: str) -> bool:
-        """🚀 重构：检查组织是否已有待处理的升级任务（工单级）"""
-        try:
-            # 获取所有待处理的升级任务
-            pending_tasks = self.db_manager.get_pending_notification_tasks()
-
-            # 检查该组织是否有任何待处理的升级任务
-            org_escalation_tasks = [
-                task for task in pending_tasks
-                if (task.org_name == org_name and
-                    task.notification_type == NotificationTaskType.ESCALATION)
-            ]
-
-            has_pending = len(org_escalation_tasks) > 0
-            if has_pending:
-                logger.info(f"Org {org_name} has {len(org_escalation_tasks)} pending escalation tasks")
+        """🚀 重构：检查组织是否已有进行中（待发送或发送中）的升级任务（工单级）
 
-            return has_pending
+        查询失败时向上抛出，避免误判为无任务而重复创建升级通知
+        """
+        has_pending = self.db_manager.has_active_escalation_task(org_name)
+        if has_pending:
+            logger.info(f"Org {org_name} has active escalation tasks")
 
-        except Exception as e:
-            logger.error(f"Failed to check pending escalation task for org {org_name}: {e}")
-            return False
+        return has_pending
 
     def _cleanup_old_escalation_tasks_for_org(self, org_name: str) -> None:
         """🚀 重构：清理该组织的旧格式升级任务（组织级ESCALATION_*任务）"""
@@ -658,6 +750,34 @@ class NotificationTaskManager:
         except Exception as e:
             logger.error(f"Failed to cleanup old escalation tasks for org {org_name}: {e}")
 
+    def _save_tasks_message(self, tasks: List[NotificationTask], message: str):
+        """保存消息内容到任务记录中 - 只在首次发送时保存，整批一次写入"""
+        new_message_tasks = [task for task in tasks if not task.message]
+        for task in new_message_tasks:
+            task.message = message
+        if new_message_tasks:
+            self.db_manager.update_notification_tasks_message(
+                [task.id for task in new_message_tasks], message
+            )
+
+    def _update_tasks_after_send(self, tasks: List[NotificationTask], run_id: int, success: bool):
+        """批量发送后更新任务状态 - 成功时整批一次写入，失败时逐个更新重试信息"""
+        if not success:
+            for task in tasks:
+                self._update_task_after_send(task, run_id, success=False)
+            return
+
+        try:
+            now = now_china_naive()
+            for task in tasks:
+                task.last_sent_at = now
+            self.db_manager.update_notification_tasks_status(
+                [task.id for task in tasks], NotificationTaskStatus.SENT, run_id
+            )
+            logger.info(f"{len(tasks)} tasks completed successfully")
+        except Exception as e:
+            logger.error(f"Failed to update {len(tasks)} tasks after send: {e}")
+
     def _update_task_after_send(self, task: NotificationTask, run_id: int, success: bool):
         """发送后更新任务状态"""
         try:
@@ -691,25 +811,27 @@ class NotificationTaskManager:
         except Exception as e:
             logger.error(f"Failed to update task {task.id} after send: {e}")
 
-    def _get_opportunities_by_order_nums(self, order_nums: List[str]) -> List[OpportunityInfo]:
-        """🚀 重构新增：根据工单号列表获取对应的商机详情"""
-        try:
-            from .data_strategy import BusinessDataStrategy
-            data_manager = BusinessDataStrategy()
-            all_opportunities = data_manager.get_opportunities(force_refresh=True)
+    def _get_opportunities_by_order_nums(self, order_nums: List[str],
+                                         opportunities: Optional[Dict[str, OpportunityInfo]] = None) -> List[OpportunityInfo]:
+        """🚀 重构新增：根据工单号列表获取对应的商机详情
 
+        使用发送前准备的商机；未提供时按工单号准备一次
+        """
+        try:
             # 🔧 修复：去重工单号列表，避免重复商机
             unique_order_nums = list(set(order_nums))
             if len(unique_order_nums) != len(order_nums):
                 logger.warning(f"Found duplicate order numbers in input: {len(order_nums)} -> {len(unique_order_nums)} unique")
 
+            if opportunities is None:
+                opportunities = self._load_opportunities_for_orders(set(unique_order_nums))
+
             # 查找匹配的商机
             matched_opportunities = []
             for order_num in unique_order_nums:
-                for opp in all_opportunities:
-                    if opp.order_num == order_num:
-                        matched_opportunities.append(opp)
-                        break
+                opp = opportunities.get(order_num)
+                if opp:
+                    matched_opportunities.append(opp)
                 else:
                     logger.warning(f"No opportunity found for order_num: {order_num}")
 
@@ -720,38 +842,22 @@ class NotificationTaskManager:
             logger.error(f"Failed to get opportunities by order numbers {order_nums}: {e}")
             return []
 
-    def _get_opportunity_info_for_notification(self, task: NotificationTask) -> OpportunityInfo:
+    def _get_opportunity_info_for_notification(self, task: NotificationTask,
+                                               opportunities: Optional[Dict[str, OpportunityInfo]] = None) -> OpportunityInfo:
         """获取通知任务对应的商机信息（用于格式化通知消息）"""
         logger.debug(f"Getting opportunity info for task {task.order_num}")
 
-        # 尝试从缓存获取完整的商机信息
-        try:
-            cached_opp = self.db_manager.get_opportunity_cache(task.order_num)
-            if cached_opp:
-                logger.debug(f"Found cached opportunity for {task.order_num}")
-                return cached_opp
-        except Exception as e:
-            logger.warning(f"Failed to get cached opportunity for {task.order_num}: {e}")
-
-        # 尝试从数据策略管理器获取最新数据
-        try:
-            from .data_strategy import BusinessDataStrategy
-            data_manager = BusinessDataStrategy()
-            all_opportunities = data_manager.get_opportunities(force_refresh=True)
-
-            # 查找匹配的商机
-            for opp in all_opportunities:
-                if opp.order_num == task.order_num:
-                    logger.debug(f"Found opportunity in data source for {task.order_num}")
-                    # 确保商机信息完整
-                    opp.update_overdue_info(use_business_time=True)
-                    return opp
-
-            # 如果没找到，记录详细信息
-            logger.warning(f"Order {task.order_num} not found in {len(all_opportunities)} opportunities from data source")
+        if opportunities is None:
+            try:
+                opportunities = self._load_opportunities_for_orders({task.order_num})
+            except Exception as e:
+                logger.warning(f"Failed to load opportunity for {task.order_num}: {e}")
+                opportunities = {}
 
-        except Exception as e:
-            logger.error(f"Failed to get opportunity from data manager for {task.order_num}: {e}")
+        opp = opportunities.get(task.order_num)
+        if opp:
+            logger.debug(f"Found opportunity for {task.order_num}")
+            return opp
 
         # 如果都获取不到，返回None，让调用方处理
         logger.warning(f"No opportunity info found for {task.order_num}, will use fallback")
@@ -849,28 +955,19 @@ class NotificationTaskManager:
             cutoff_time = now_china_naive() - timedelta(days=days_back)
 
             with self.db_manager.get_session() as session:
-                # 查询要清理的任务（已完成且超过指定天数）
-                old_tasks_query = session.query(NotificationTaskTable).filter(
+                # 单条 DELETE 清理已完成且超过指定天数的任务（走 status+created_at 索引），
+                # 不再先 COUNT 再 DELETE 扫描两遍
+                deleted_count = session.query(NotificationTaskTable).filter(
                     NotificationTaskTable.created_at < cutoff_time,
                     NotificationTaskTable.status.in_(['sent', 'confirmed', 'failed'])
-                )
-
-                # 获取要删除的任务数量
-                count_to_delete = old_tasks_query.count()
-
-                if count_to_delete > 0:
-                    # 记录要删除的任务信息
-                    logger.info(f"Found {count_to_delete} old notification tasks to cleanup (older than {days_back} days)")
-
-                    # 执行删除
-                    deleted_count = old_tasks_query.delete()
-                    session.commit()
+                ).delete(synchronize_session=False)
+                session.commit()
 
-                    logger.info(f"Successfully cleaned up {deleted_count} old notification tasks")
-                    return deleted_count
+                if deleted_count > 0:
+                    logger.info(f"Successfully cleaned up {deleted_count} old notification tasks (older than {days_back} days)")
                 else:
                     logger.info(f"No old notification tasks found to cleanup (older than {days_back} days)")
-                    return 0
+                return deleted_count
 
         except Exception as e:
             logger.error(f"Failed to cleanup old tasks: {e}")
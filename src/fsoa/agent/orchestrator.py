@@ -4,19 +4,22 @@ Agent编排器模块
 基于LangGraph实现Agent工作流编排
 """
 
+import asyncio
 import uuid
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Any, List, Optional, TypedDict
+from functools import cached_property, lru_cache, wraps
+from typing import Callable, Dict, Any, List, Optional
 from langgraph.graph import StateGraph, END
 
 from ..data.models import (
     # 推荐的模型
     AgentExecution, AgentStatus, DecisionResult, OpportunityInfo, NotificationTask, Priority,
-    # 废弃的模型（仅用于兼容性）
-    TaskInfo
+    NotificationTaskType
 )
 from ..data.database import get_db_manager
-from ..utils.logger import get_logger, log_agent_step
+from ..utils.logger import get_logger
 from ..utils.config import get_config
 from .tools import (
     # 推荐的工具函数
@@ -25,97 +28,175 @@ from .tools import (
     start_agent_execution, complete_agent_execution,
     get_data_statistics, refresh_business_data,
     # 管理器
-    get_data_strategy, get_notification_manager, get_execution_tracker,
-    # 废弃的兼容性函数（存在任务-商机概念混淆）
-    send_business_notifications
+    get_data_strategy, get_notification_manager, get_execution_tracker
 )
 from .decision import create_decision_engine
 from .llm import get_deepseek_client
 
 logger = get_logger(__name__)
 
+# 执行ID格式：exec_<开始时间>_<随机后缀>
+EXECUTION_ID_TEMPLATE = "exec_{start_time:%Y%m%d_%H%M%S}_{suffix}"
+
+
+def _count_tasks_by_type(notification_tasks: List[NotificationTask]) -> Dict[str, int]:
+    """单次遍历统计各类型通知任务数量（枚举成员直接比较）"""
+    reminder_count = 0
+    escalation_count = 0
+    for task in notification_tasks:
+        task_type = task.notification_type
+        if task_type is NotificationTaskType.REMINDER:
+            reminder_count += 1
+        elif task_type is NotificationTaskType.ESCALATION:
+            escalation_count += 1
+    return {"reminder_tasks": reminder_count, "escalation_tasks": escalation_count}
+
+
+def _summarize_opportunities(opportunities: List[OpportunityInfo]) -> Dict[str, Any]:
+    """汇总商机超时/升级数量及按组织统计 - 组织名只读取一次，计数交给Counter"""
+    org_names = [opp.org_name for opp in opportunities]
+    total_by_org = Counter(org_names)
+    overdue_by_org = Counter([org for org, opp in zip(org_names, opportunities) if opp.is_overdue])
+    escalation_by_org = Counter([org for org, opp in zip(org_names, opportunities) if opp.escalation_level > 0])
+    return {
+        "total_opportunities": len(opportunities),
+        "overdue_count": sum(overdue_by_org.values()),
+        "escalation_count": sum(escalation_by_org.values()),
+        "organization_stats": {
+            org: {"total": total, "overdue": overdue_by_org[org], "escalation": escalation_by_org[org]}
+            for org, total in total_by_org.items()
+        }
+    }
+
 
-class AgentState(TypedDict):
+@dataclass(slots=True)
+class AgentState:
     """Agent状态定义 - 重构后使用新的数据模型"""
     execution_id: str
     run_id: int  # Agent运行ID
     start_time: datetime
-    opportunities: List[OpportunityInfo]  # 使用商机而不是任务
-    processed_opportunities: List[OpportunityInfo]
-    notification_tasks: List[NotificationTask]  # 通知任务
-    notifications_sent: int
-    errors: List[str]
-    current_opportunity: Optional[OpportunityInfo]
-    decision_result: Optional[DecisionResult]
-    context: Dict[str, Any]
+    opportunities: List[OpportunityInfo] = field(default_factory=list)  # 使用商机而不是任务
+    opportunities_processed: int = 0  # 已处理商机数（只需计数，不保存列表）
+    notification_tasks: List[NotificationTask] = field(default_factory=list)  # 通知任务
+    notifications_sent: int = 0
+    errors: List[str] = field(default_factory=list)
+    current_opportunity: Optional[OpportunityInfo] = None
+    decision_result: Optional[DecisionResult] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+
+
+def _record_node_error(errors: List[str], output: Dict[str, Any], action: str, error: Exception) -> None:
+    """记录节点异常 - 写入状态错误列表和步骤输出，并输出带堆栈的错误日志（须在except块内调用）"""
+    error_msg = f"Failed to {action}: {error}"
+    errors.append(error_msg)
+    output["error"] = error_msg
+    logger.exception("Failed to %s: %s", action, error)
+
+
+def _run_node(stage: str, action: str, on_error: Optional[Callable[..., None]] = None):
+    """节点装饰器 - 统一步骤追踪与异常记录，节点方法只包含业务逻辑
+
+    被装饰方法以 (self, state, output) 调用，output 为本步骤的追踪输出；
+    异常时记录错误，再调用 on_error(self, state, output) 执行降级处理
+    """
+    def decorator(method):
+        @wraps(method)
+        def node(self, state: AgentState) -> AgentState:
+            with self.execution_tracker.track_step(stage, {"run_id": state.run_id}) as output:
+                try:
+                    method(self, state, output)
+                except Exception as e:
+                    _record_node_error(state.errors, output, action, e)
+                    if on_error is not None:
+                        on_error(self, state, output)
+            return state
+        return node
+    return decorator
+
+
+def _orchestrator_node(method_name: str):
+    """构造图节点 - 运行时从config取出当前编排器实例并调用对应方法，使编译后的图可在实例间共享"""
+    def node(state: AgentState, config) -> Any:
+        return getattr(config["configurable"]["orchestrator"], method_name)(state)
+    node.__name__ = method_name
+    return node
+
+
+@lru_cache(maxsize=None)
+def _get_compiled_graph():
+    """构建Agent执行图 - 符合架构设计的6步流程（进程内只编译一次）"""
+    # 创建状态图
+    workflow = StateGraph(AgentState)
+
+    # 添加节点 - 按照架构设计的6个核心流程
+    workflow.add_node("fetch_data", _orchestrator_node("_fetch_data_node"))           # 2. 获取任务数据
+    workflow.add_node("analyze_status", _orchestrator_node("_analyze_status_node"))   # 3. 分析超时状态
+    workflow.add_node("make_decision", _orchestrator_node("_make_decision_node"))     # 4. 智能决策
+    workflow.add_node("send_notifications", _orchestrator_node("_send_notification_node"))  # 5. 发送通知
+    workflow.add_node("record_results", _orchestrator_node("_record_results_node"))   # 6. 记录结果
+
+    # 设置入口点
+    workflow.set_entry_point("fetch_data")
+
+    # 添加边 - 线性流程，符合架构设计
+    workflow.add_edge("fetch_data", "analyze_status")
+    workflow.add_conditional_edges(
+        "analyze_status",
+        AgentOrchestrator._should_continue_processing,
+        {
+            "continue": "make_decision",
+            "skip": "record_results"
+        }
+    )
+    workflow.add_edge("make_decision", "send_notifications")
+    workflow.add_edge("send_notifications", "record_results")
+    workflow.add_edge("record_results", END)
 
-    # 兼容性字段（已废弃，仅保留以避免导入错误）
-    tasks: Optional[List[TaskInfo]]  # 废弃：使用opportunities替代
-    processed_tasks: Optional[List[TaskInfo]]  # 废弃：使用processed_opportunities替代
-    current_task: Optional[TaskInfo]  # 废弃：使用current_opportunity替代
+    # 单次批处理运行无需断点续跑，不挂载checkpointer，避免每次节点切换序列化整份商机/任务列表；
+    # 运行结果由 AgentExecutionTracker 记录
+    return workflow.compile(checkpointer=None)
 
 
 class AgentOrchestrator:
     """Agent编排器 - 重构后使用新的管理器架构"""
 
     def __init__(self):
+        # 以下get_*访问器均为模块级单例（首次调用时初始化），重复构造编排器不会重复读取配置或建立连接
         self.config = get_config()
         self.db_manager = get_db_manager()
-        self.decision_engine = create_decision_engine()
 
         # 新的管理器
         self.data_strategy = get_data_strategy()
         self.notification_manager = get_notification_manager()
         self.execution_tracker = get_execution_tracker()
 
-        self.graph = self._build_graph()
-        
-    def _build_graph(self):
-        """构建Agent执行图 - 符合架构设计的6步流程"""
-        # 创建状态图
-        workflow = StateGraph(AgentState)
-
-        # 添加节点 - 按照架构设计的6个核心流程
-        workflow.add_node("fetch_data", self._fetch_data_node)           # 2. 获取任务数据
-        workflow.add_node("analyze_status", self._analyze_status_node)   # 3. 分析超时状态
-        workflow.add_node("make_decision", self._make_decision_node)     # 4. 智能决策
-        workflow.add_node("send_notifications", self._send_notification_node)  # 5. 发送通知
-        workflow.add_node("record_results", self._record_results_node)   # 6. 记录结果
-
-        # 设置入口点
-        workflow.set_entry_point("fetch_data")
-
-        # 添加边 - 线性流程，符合架构设计
-        workflow.add_edge("fetch_data", "analyze_status")
-        workflow.add_conditional_edges(
-            "analyze_status",
-            self._should_continue_processing,
-            {
-                "continue": "make_decision",
-                "skip": "record_results"
-            }
-        )
-        workflow.add_edge("make_decision", "send_notifications")
-        workflow.add_edge("send_notifications", "record_results")
-        workflow.add_edge("record_results", END)
+    @cached_property
+    def decision_engine(self):
+        """决策引擎 - 创建时需查询数据库决策模式，且工作流节点不直接使用，故按需创建"""
+        return create_decision_engine()
 
-        return workflow.compile()
-    
-    def execute(self, dry_run: bool = False, force_refresh: bool = False) -> AgentExecution:
+    @property
+    def graph(self):
+        """Agent执行图 - 模块级共享，首次执行时编译一次"""
+        return _get_compiled_graph()
+
+    def execute(self, dry_run: bool = False, force_refresh: bool = False,
+                progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> AgentExecution:
         """
         执行Agent工作流 - 重构版本使用新管理器
 
         Args:
             dry_run: 是否为试运行
             force_refresh: 是否强制刷新数据
+            progress_callback: 进度回调，每个节点完成后以 (节点名, 当前状态) 调用
 
         Returns:
             执行结果
         """
-        execution_id = f"exec_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         start_time = datetime.now()
+        execution_id = EXECUTION_ID_TEMPLATE.format(start_time=start_time, suffix=uuid.uuid4().hex[:8])
 
-        logger.info(f"Starting Agent execution: {execution_id} (dry_run={dry_run})")
+        logger.info("Starting Agent execution: %s (dry_run=%s)", execution_id, dry_run)
 
         # 使用新的执行追踪器
         context = {
@@ -135,17 +216,13 @@ class AgentOrchestrator:
                 run_id=run_id,
                 start_time=start_time,
                 opportunities=[],
-                processed_opportunities=[],
+                opportunities_processed=0,
                 notification_tasks=[],
                 notifications_sent=0,
                 errors=[],
                 current_opportunity=None,
                 decision_result=None,
-                context=context,
-                # 兼容性字段
-                tasks=[],
-                processed_tasks=[],
-                current_task=None
+                context=context
             )
 
             # 创建执行记录（兼容性）
@@ -157,12 +234,31 @@ class AgentOrchestrator:
 
             # 执行记录现在通过 AgentExecutionTracker 管理，不再使用废弃的 save_agent_execution
 
-            # 执行工作流
-            final_state = self.graph.invoke(initial_state)
+            # 执行工作流（各步骤记录在运行结束时批量写入）- 流式执行，逐节点输出进度
+            final_state = {}
+            with self.execution_tracker.buffered_steps(run_id):
+                node_name = None
+                for mode, chunk in self.graph.stream(
+                    initial_state,
+                    config={"configurable": {"orchestrator": self}},
+                    stream_mode=["updates", "values"]
+                ):
+                    if mode == "updates":
+                        node_name = next(iter(chunk), None)
+                        continue
+
+                    final_state = chunk
+                    if node_name:
+                        logger.info("Agent node completed: %s (errors=%d)", node_name, len(chunk.get("errors", [])))
+                        if progress_callback:
+                            try:
+                                progress_callback(node_name, chunk)
+                            except Exception as e:
+                                logger.error("Progress callback failed at %s: %s", node_name, e)
 
             # 完成执行
             final_stats = {
-                "opportunities_processed": len(final_state.get("processed_opportunities", [])),
+                "opportunities_processed": final_state.get("opportunities_processed", 0),
                 "notifications_sent": final_state.get("notifications_sent", 0),
                 "notification_tasks_created": len(final_state.get("notification_tasks", [])),
                 "errors_count": len(final_state.get("errors", [])),
@@ -174,15 +270,15 @@ class AgentOrchestrator:
             # 更新执行结果（兼容性）
             execution.end_time = datetime.now()
             execution.status = AgentStatus.IDLE if success else AgentStatus.ERROR
-            execution.tasks_processed = len(final_state.get("processed_opportunities", []))
+            execution.tasks_processed = final_state.get("opportunities_processed", 0)
             execution.notifications_sent = final_state["notifications_sent"]
             execution.errors = final_state["errors"]
             execution.context = final_state["context"]
             
-            logger.info(f"Agent execution completed: {execution_id}")
+            logger.info("Agent execution completed: %s", execution_id)
             
         except Exception as e:
-            logger.error(f"Agent execution failed: {e}")
+            logger.error("Agent execution failed: %s", e)
             execution.end_time = datetime.now()
             execution.status = AgentStatus.ERROR
             execution.errors = [str(e)]
@@ -193,336 +289,187 @@ class AgentOrchestrator:
         
         return execution
     
-    def _fetch_data_node(self, state: AgentState) -> AgentState:
-        """2. 获取任务数据 - 从Metabase获取商机数据"""
-        run_id = state["run_id"]
+    async def aexecute(self, dry_run: bool = False, force_refresh: bool = False) -> AgentExecution:
+        """
+        异步执行Agent工作流 - 供asyncio调用方使用
 
-        # 使用执行追踪器记录步骤
-        with self.execution_tracker.track_step("fetch_data", {"run_id": run_id}) as output:
-            try:
-                # 使用新的数据策略获取商机
-                force_refresh = state["context"].get("force_refresh", False)
-                opportunities = self.data_strategy.get_overdue_opportunities(force_refresh)
+        工作流各节点前后依赖，节点内的网络I/O（如多组织通知发送）已并发处理，
+        这里将整次执行放入工作线程，避免阻塞事件循环，多次运行可并行等待。
 
-                # 更新状态
-                state["opportunities"] = opportunities
-                state["context"]["total_opportunities"] = len(opportunities)
-                state["context"]["use_business_flow"] = True
+        Args:
+            dry_run: 是否为试运行
+            force_refresh: 是否强制刷新数据
 
-                # 输出数据
-                output["opportunity_count"] = len(opportunities)
-                output["overdue_count"] = len([opp for opp in opportunities if opp.is_overdue])
-                output["escalation_count"] = len([opp for opp in opportunities if opp.escalation_level > 0])
-                output["organizations"] = len(set(opp.org_name for opp in opportunities))
+        Returns:
+            执行结果
+        """
+        return await asyncio.to_thread(self.execute, dry_run=dry_run, force_refresh=force_refresh)
+
+    def _use_cached_opportunities(self, state: AgentState, output: Dict[str, Any]) -> None:
+        """获取商机失败时的降级策略：尝试从缓存获取"""
+        context = state.context
+        try:
+            cached_opportunities = self.data_strategy.get_cached_opportunities()
+            if cached_opportunities:
+                state.opportunities = cached_opportunities
+                context["total_opportunities"] = len(cached_opportunities)
+                context["analysis_result"] = _summarize_opportunities(cached_opportunities)
+                context["use_cached_data"] = True
+                output["fallback_to_cache"] = True
+                output["cached_opportunity_count"] = len(cached_opportunities)
+                logger.warning("Using %d cached opportunities as fallback", len(cached_opportunities))
+            else:
+                state.opportunities = []
+                context["total_opportunities"] = 0
+                output["fallback_failed"] = True
+        except Exception as cache_error:
+            logger.error("Cache fallback also failed: %s", cache_error)
+            state.opportunities = []
+            context["total_opportunities"] = 0
+
+    @_run_node("fetch_data", "fetch opportunities", on_error=_use_cached_opportunities)
+    def _fetch_data_node(self, state: AgentState, output: Dict[str, Any]) -> None:
+        """2. 获取任务数据 - 从Metabase获取商机数据"""
+        context = state.context
 
-                logger.info(f"Fetched {len(opportunities)} overdue opportunities from {output['organizations']} organizations")
+        # 使用新的数据策略获取商机
+        force_refresh = context.get("force_refresh", False)
+        opportunities = self.data_strategy.get_overdue_opportunities(force_refresh)
 
-                
+        # 更新状态
+        state.opportunities = opportunities
+        context["total_opportunities"] = len(opportunities)
+        context["use_business_flow"] = True
 
-            except Exception as e:
-                error_msg = f"Failed to fetch opportunities: {e}"
-                state["errors"].append(error_msg)
-                output["error"] = error_msg
-                logger.error(error_msg)
+        # 输出数据
+        summary = context["analysis_result"] = _summarize_opportunities(opportunities)
+        output["opportunity_count"] = len(opportunities)
+        output["overdue_count"] = summary["overdue_count"]
+        output["escalation_count"] = summary["escalation_count"]
+        output["organizations"] = len(summary["organization_stats"])
 
-                # 降级策略：尝试从缓存获取
-                try:
-                    cached_opportunities = self.data_strategy.get_cached_opportunities()
-                    if cached_opportunities:
-                        state["opportunities"] = cached_opportunities
-                        state["context"]["total_opportunities"] = len(cached_opportunities)
-                        state["context"]["use_cached_data"] = True
-                        output["fallback_to_cache"] = True
-                        output["cached_opportunity_count"] = len(cached_opportunities)
-                        logger.warning(f"Using {len(cached_opportunities)} cached opportunities as fallback")
-                    else:
-                        state["opportunities"] = []
-                        state["context"]["total_opportunities"] = 0
-                        output["fallback_failed"] = True
-                except Exception as cache_error:
-                    logger.error(f"Cache fallback also failed: {cache_error}")
-                    state["opportunities"] = []
-                    state["context"]["total_opportunities"] = 0
-
-        return state
-
-    def _analyze_status_node(self, state: AgentState) -> AgentState:
+        logger.info("Fetched %d overdue opportunities from %d organizations", len(opportunities), output["organizations"])
+
+    @_run_node("analyze_status", "analyze status")
+    def _analyze_status_node(self, state: AgentState, output: Dict[str, Any]) -> None:
         """3. 分析超时状态 - 分析商机的超时状态和优先级"""
-        run_id = state["run_id"]
-
-        with self.execution_tracker.track_step("analyze_status", {"run_id": run_id}) as output:
-            try:
-                opportunities = state.get("opportunities", [])
-
-                if not opportunities:
-                    output["message"] = "No opportunities to analyze"
-                    logger.info("No opportunities to analyze")
-                    return state
-
-                # 分析超时状态
-                overdue_opportunities = [opp for opp in opportunities if opp.is_overdue]
-                escalation_opportunities = [opp for opp in opportunities if opp.escalation_level > 0]
-
-                # 按组织分组
-                org_stats = {}
-                for opp in opportunities:
-                    if opp.org_name not in org_stats:
-                        org_stats[opp.org_name] = {"total": 0, "overdue": 0, "escalation": 0}
-                    org_stats[opp.org_name]["total"] += 1
-                    if opp.is_overdue:
-                        org_stats[opp.org_name]["overdue"] += 1
-                    if opp.escalation_level > 0:
-                        org_stats[opp.org_name]["escalation"] += 1
-
-                # 更新状态
-                state["context"]["analysis_result"] = {
-                    "total_opportunities": len(opportunities),
-                    "overdue_count": len(overdue_opportunities),
-                    "escalation_count": len(escalation_opportunities),
-                    "organization_stats": org_stats
-                }
-
-                # 输出统计
-                output.update(state["context"]["analysis_result"])
-
-                logger.info(f"Analyzed {len(opportunities)} opportunities: {len(overdue_opportunities)} overdue, {len(escalation_opportunities)} need escalation")
-
-            except Exception as e:
-                error_msg = f"Failed to analyze status: {e}"
-                state["errors"].append(error_msg)
-                output["error"] = error_msg
-                logger.error(error_msg)
-
-        return state
-
-    def _make_decision_node(self, state: AgentState) -> AgentState:
+        opportunities = state.opportunities
+        # 路由结果在此一次算好，条件边只需查表
+        state.context["route"] = "continue" if opportunities else "skip"
+
+        if not opportunities:
+            output["message"] = "No opportunities to analyze"
+            logger.info("No opportunities to analyze")
+            return
+
+        # 获取数据时已完成统计，直接复用；缺失时再单次遍历计算
+        analysis_result = state.context.get("analysis_result")
+        if analysis_result is None:
+            analysis_result = state.context["analysis_result"] = _summarize_opportunities(opportunities)
+
+        # 输出统计
+        output.update(analysis_result)
+
+        logger.info("Analyzed %d opportunities: %d overdue, %d need escalation",
+                    len(opportunities), analysis_result["overdue_count"], analysis_result["escalation_count"])
+
+    @_run_node("make_decision", "make decision")
+    def _make_decision_node(self, state: AgentState, output: Dict[str, Any]) -> None:
         """4. 智能决策 - 基于规则+LLM的混合决策"""
-        run_id = state["run_id"]
-
-        with self.execution_tracker.track_step("make_decision", {"run_id": run_id}) as output:
-            try:
-                opportunities = state.get("opportunities", [])
-
-                if not opportunities:
-                    output["message"] = "No opportunities for decision making"
-                    logger.info("No opportunities for decision making")
-                    return state
-
-                # 创建通知任务（包含决策逻辑）
-                notification_tasks = self.notification_manager.create_notification_tasks(
-                    opportunities, run_id
-                )
-
-                state["notification_tasks"] = notification_tasks
-                state["processed_opportunities"] = opportunities.copy()
-
-                # 输出决策结果
-                output["notification_tasks_created"] = len(notification_tasks)
-                output["standard_tasks"] = len([t for t in notification_tasks if t.notification_type.value == "standard"])
-                output["escalation_tasks"] = len([t for t in notification_tasks if t.notification_type.value == "escalation"])
-
-                logger.info(f"Decision made: created {len(notification_tasks)} notification tasks")
-
-            except Exception as e:
-                error_msg = f"Failed to make decision: {e}"
-                state["errors"].append(error_msg)
-                output["error"] = error_msg
-                logger.error(error_msg)
-
-        return state
-
-    def _process_task_node(self, state: AgentState) -> AgentState:
-        """处理任务节点 - 重构版本处理商机和通知任务"""
-        run_id = state["run_id"]
-
-        # 使用执行追踪器记录步骤
-        with self.execution_tracker.track_step("process_opportunities", {"run_id": run_id}) as output:
-            try:
-                opportunities = state.get("opportunities", [])
-
-                if not opportunities:
-                    output["message"] = "No opportunities to process"
-                    logger.info("No opportunities to process")
-                    return state
-
-                # 创建通知任务
-                notification_tasks = self.notification_manager.create_notification_tasks(
-                    opportunities, run_id
-                )
-
-                state["notification_tasks"] = notification_tasks
-                state["processed_opportunities"] = opportunities.copy()
-
-                # 输出统计
-                output["opportunities_processed"] = len(opportunities)
-                output["notification_tasks_created"] = len(notification_tasks)
-                output["standard_tasks"] = len([t for t in notification_tasks if t.notification_type.value == "standard"])
-                output["escalation_tasks"] = len([t for t in notification_tasks if t.notification_type.value == "escalation"])
-
-                logger.info(f"Processed {len(opportunities)} opportunities, created {len(notification_tasks)} notification tasks")
-
-                # 向后兼容：处理传统任务
-                remaining_tasks = [
-                    task for task in state.get("tasks", [])
-                    if task not in state.get("processed_tasks", [])
-                ]
-
-                if remaining_tasks:
-                    current_task = remaining_tasks[0]
-                    state["current_task"] = current_task
-                    output["legacy_task_id"] = current_task.id
-                    output["legacy_task_title"] = current_task.title
-                    logger.info(f"Also processing legacy task: {current_task.title}")
-                else:
-                    state["current_task"] = None
-                    output["legacy_tasks_remaining"] = 0
-
-            except Exception as e:
-                error_msg = f"Failed to process opportunities: {e}"
-                state["errors"].append(error_msg)
-                output["error"] = error_msg
-                logger.error(error_msg)
-
-        return state
-    
-    def _record_results_node(self, state: AgentState) -> AgentState:
+        opportunities = state.opportunities
+
+        if not opportunities:
+            output["message"] = "No opportunities for decision making"
+            logger.info("No opportunities for decision making")
+            return
+
+        # 创建通知任务（包含决策逻辑）
+        notification_tasks = self.notification_manager.create_notification_tasks(
+            opportunities, state.run_id
+        )
+
+        state.notification_tasks = notification_tasks
+        state.opportunities_processed = len(opportunities)
+
+        # 输出决策结果
+        output["notification_tasks_created"] = len(notification_tasks)
+        output.update(_count_tasks_by_type(notification_tasks))
+
+        logger.info("Decision made: created %d notification tasks", len(notification_tasks))
+
+    @_run_node("record_results", "record results")
+    def _record_results_node(self, state: AgentState, output: Dict[str, Any]) -> None:
         """6. 记录结果 - 记录执行结果和统计信息"""
-        run_id = state["run_id"]
-
-        with self.execution_tracker.track_step("record_results", {"run_id": run_id}) as output:
-            try:
-                # 统计执行结果
-                opportunities = state.get("opportunities", [])
-                processed_opportunities = state.get("processed_opportunities", [])
-                notification_tasks = state.get("notification_tasks", [])
-                notifications_sent = state.get("notifications_sent", 0)
-                errors = state.get("errors", [])
-
-                # 记录最终统计
-                final_stats = {
-                    "total_opportunities": len(opportunities),
-                    "processed_opportunities": len(processed_opportunities),
-                    "notification_tasks_created": len(notification_tasks),
-                    "notifications_sent": notifications_sent,
-                    "errors_count": len(errors),
-                    "success_rate": (notifications_sent / len(notification_tasks)) if notification_tasks else 1.0
-                }
-
-                state["context"]["final_stats"] = final_stats
-                output.update(final_stats)
-
-                # 记录到日志
-                logger.info(f"Execution completed: {final_stats}")
-
-                # 向后兼容：记录传统任务统计
-                legacy_tasks = state.get("tasks", [])
-                processed_tasks = state.get("processed_tasks", [])
-                output["legacy_tasks_total"] = len(legacy_tasks)
-                output["legacy_tasks_processed"] = len(processed_tasks)
-
-            except Exception as e:
-                error_msg = f"Failed to record results: {e}"
-                state["errors"].append(error_msg)
-                output["error"] = error_msg
-                logger.error(error_msg)
-
-        return state
-    
-    def _send_notification_node(self, state: AgentState) -> AgentState:
-        """发送通知节点 - 重构版本使用新的通知管理器"""
-        run_id = state["run_id"]
-
-        # 使用执行追踪器记录步骤
-        with self.execution_tracker.track_step("send_notifications", {"run_id": run_id}) as output:
-            try:
-                # 检查是否为试运行
-                if state["context"].get("dry_run", False):
-                    logger.info("DRY RUN: Would execute notification tasks")
-                    # 模拟执行结果
-                    notification_tasks = state.get("notification_tasks", [])
-                    result = {
-                        "total_tasks": len(notification_tasks),
-                        "sent_count": len(notification_tasks),
-                        "failed_count": 0,
-                        "escalated_count": len([t for t in notification_tasks if t.notification_type.value == "escalation"]),
-                        "errors": []
-                    }
-                    output.update(result)
-                    state["notifications_sent"] = result["sent_count"]
-                    logger.info(f"DRY RUN: Simulated sending {result['sent_count']} notifications")
-                else:
-                    # 执行实际的通知任务
-                    result = self.notification_manager.execute_pending_tasks(run_id)
-
-                    # 转换结果格式
-                    result_dict = {
-                        "total_tasks": result.total_tasks,
-                        "sent_count": result.sent_count,
-                        "failed_count": result.failed_count,
-                        "escalated_count": result.escalated_count,
-                        "errors": result.errors
-                    }
-
-                    output.update(result_dict)
-                    state["notifications_sent"] = result.sent_count
-
-                    if result.errors:
-                        state["errors"].extend(result.errors)
-
-                    logger.info(f"Executed notifications: {result.sent_count} sent, {result.failed_count} failed")
-
-                # 向后兼容：处理传统任务通知
-                current_task = state.get("current_task")
-                decision = state.get("decision_result")
-
-                if current_task and decision and decision.action in ["notify", "escalate"]:
-                    try:
-                        if state["context"].get("dry_run", False):
-                            logger.info(f"DRY RUN: Would send legacy notification for task {current_task.id}")
-                            legacy_success = True
-                        else:
-                            # 发送传统通知
-                            message = decision.message or f"任务 {current_task.id} 需要关注"
-                            legacy_success = send_notification(current_task, message, decision.priority)
-
-                        if legacy_success:
-                            state["notifications_sent"] += 1
-                            output["legacy_notification_sent"] = True
-                            logger.info(f"Sent legacy notification for task {current_task.id}")
-
-                    except Exception as e:
-                        error_msg = f"Failed to send legacy notification: {e}"
-                        state["errors"].append(error_msg)
-                        output["legacy_notification_error"] = error_msg
-                        logger.error(error_msg)
-
-            except Exception as e:
-                error_msg = f"Failed to execute notifications: {e}"
-                state["errors"].append(error_msg)
-                output["error"] = error_msg
-                logger.error(error_msg)
+        # 统计执行结果
+        opportunities = state.opportunities
+        opportunities_processed = state.opportunities_processed
+        notification_tasks = state.notification_tasks
+        notifications_sent = state.notifications_sent
+        errors = state.errors
+
+        # 记录最终统计
+        final_stats = {
+            "total_opportunities": len(opportunities),
+            "processed_opportunities": opportunities_processed,
+            "notification_tasks_created": len(notification_tasks),
+            "notifications_sent": notifications_sent,
+            "errors_count": len(errors),
+            "success_rate": (notifications_sent / len(notification_tasks)) if notification_tasks else 1.0
+        }
+
+        state.context["final_stats"] = final_stats
+        output.update(final_stats)
 
+        # 记录到日志
+        logger.info("Execution completed: %s", final_stats)
 
+    @_run_node("send_notifications", "execute notifications")
+    def _send_notification_node(self, state: AgentState, output: Dict[str, Any]) -> None:
+        """发送通知节点 - 重构版本使用新的通知管理器"""
+        # 检查是否为试运行
+        if state.context.get("dry_run", False):
+            logger.info("DRY RUN: Would execute notification tasks")
+            # 模拟执行结果
+            notification_tasks = state.notification_tasks
+            result = {
+                "total_tasks": len(notification_tasks),
+                "sent_count": len(notification_tasks),
+                "failed_count": 0,
+                "escalated_count": _count_tasks_by_type(notification_tasks)["escalation_tasks"],
+                "errors": []
+            }
+            output.update(result)
+            state.notifications_sent = result["sent_count"]
+            logger.info("DRY RUN: Simulated sending %d notifications", result["sent_count"])
+            return
+
+        # 执行实际的通知任务
+        result = self.notification_manager.execute_pending_tasks(state.run_id, state.opportunities)
+
+        # 转换结果格式
+        output.update({
+            "total_tasks": result.total_tasks,
+            "sent_count": result.sent_count,
+            "failed_count": result.failed_count,
+            "escalated_count": result.escalated_count,
+            "errors": result.errors
+        })
+        state.notifications_sent = result.sent_count
+
+        if result.errors:
+            state.errors.extend(result.errors)
+
+        logger.info("Executed notifications: %d sent, %d failed", result.sent_count, result.failed_count)
     
     # 移除 _update_status_node - 状态更新已集成到通知管理器中
     
     # _finalize_node 已被 _record_results_node 替代
     
-    def _should_continue_processing(self, state: AgentState) -> str:
-        """判断是否继续处理 - 基于分析结果决定"""
-        opportunities = state.get("opportunities", [])
-        analysis_result = state.get("context", {}).get("analysis_result", {})
-
-        # 如果有商机需要处理，继续执行决策
-        if opportunities and analysis_result.get("overdue_count", 0) > 0:
-            return "continue"
-        elif opportunities:
-            # 有商机但没有超时的，也继续处理（可能有其他需要通知的情况）
-            return "continue"
-        else:
-            # 没有商机，跳过后续处理
-            return "skip"
-    
+    @staticmethod
+    def _should_continue_processing(state: AgentState) -> str:
+        """判断是否继续处理 - 有商机（无论是否超时）即继续，否则跳过；路由由分析节点预先写入context"""
+        return state.context.get("route", "skip")
+
     def get_execution_history(self, limit: int = 10) -> List[AgentExecution]:
         """获取执行历史"""
         # 这里需要实现从数据库获取执行历史的逻辑
@@ -537,59 +484,3 @@ class AgentOrchestrator:
             "next_execution": None,
             "total_executions": 0
         }
-
-    def _send_business_notifications(self, state: AgentState) -> AgentState:
-        """发送业务通知（新流程）"""
-        opportunities = state["context"].get("opportunities", [])
-
-        if not opportunities:
-            log_agent_step(
-                "send_business_notifications",
-                output_data={"message": "No opportunities to notify"}
-            )
-            return state
-
-        log_agent_step(
-            "send_business_notifications",
-            input_data={"opportunity_count": len(opportunities)}
-        )
-
-        try:
-            # 检查是否为试运行
-            if state["context"].get("dry_run", False):
-                logger.info(f"DRY RUN: Would send business notifications for {len(opportunities)} opportunities")
-                result = {
-                    "total": len(opportunities),
-                    "sent": len(opportunities),
-                    "failed": 0,
-                    "escalated": sum(1 for opp in opportunities if opp.escalation_level > 0)
-                }
-            else:
-                # 发送业务通知
-                result = send_business_notifications(opportunities)
-
-            # 更新状态
-            state["notifications_sent"] += result["sent"]
-            state["context"]["notification_result"] = result
-
-            log_agent_step(
-                "send_business_notifications",
-                output_data={
-                    "success": True,
-                    "total": result["total"],
-                    "sent": result["sent"],
-                    "failed": result["failed"],
-                    "escalated": result["escalated"]
-                }
-            )
-
-            if result["failed"] > 0:
-                error_msg = f"Failed to send {result['failed']} notifications"
-                state["errors"].append(error_msg)
-
-        except Exception as e:
-            error_msg = f"Business notification sending failed: {e}"
-            state["errors"].append(error_msg)
-            log_agent_step("send_business_notifications", error=error_msg)
-
-        return state
@@ -4,27 +4,29 @@ Agent工具函数模块
 提供Agent使用的核心工具函数
 """
 
+import asyncio
+import inspect
 import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # 导入时区工具
-from ..utils.timezone_utils import now_china_naive
-from typing import List, Optional, Dict, Any
-from functools import wraps
-
-from ..data.models import (
-    NotificationInfo, NotificationStatus, Priority, OpportunityInfo,
-    TaskStatus, NotificationTask, TaskInfo
-)
+from ..utils.timezone_utils import now_china_naive, utc_to_china
+from typing import Callable, List, Optional, Dict, Any, Tuple, Type
+from functools import lru_cache, wraps
+
+from ..data.models import OpportunityInfo
 from ..data.database import get_db_manager
-from ..data.metabase import get_metabase_client, MetabaseError
-from ..notification.wechat import send_wechat_message, get_wechat_client, WeChatError
-from ..notification.business_formatter import BusinessNotificationFormatter
+from ..data.metabase import get_metabase_client
+from ..notification.wechat import send_wechat_message, get_wechat_client
 from ..utils.logger import get_logger, log_function_call
-from ..utils.config import get_config
+from ..utils.config import get_config, register_reload_callback
+from ..utils.scheduler import get_scheduler
 
 # 导入新的管理器
 from .managers import NotificationTaskManager, AgentExecutionTracker, BusinessDataStrategy
+from .llm import get_deepseek_client
 
 logger = get_logger(__name__)
 
@@ -34,9 +36,54 @@ class ToolError(Exception):
     pass
 
 
-def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
-    """重试装饰器"""
+def retry_on_failure(max_retries: int = 3, delay: float = 1.0,
+                     exceptions: Tuple[Type[BaseException], ...] = (Exception,)):
+    """重试装饰器 - 同时支持同步函数与协程函数（协程退避使用 asyncio.sleep，不阻塞事件循环）
+
+    只有 exceptions 中的异常会触发重试，其他异常（如参数错误）立即抛出；
+    max_retries 为总尝试次数，至少为1
+    """
+    if max_retries < 1:
+        raise ValueError(f"max_retries must be at least 1, got {max_retries}")
+
+    # 指数退避序列在装饰时预先计算，失败路径上只需按下标取值
+    delays = tuple(delay * (1 << i) for i in range(max_retries - 1))
+
     def decorator(func):
+        def on_failure(attempt: int, e: BaseException) -> Optional[float]:
+            """记录失败并返回退避时间，已无重试机会时返回None"""
+            if attempt == max_retries - 1:
+                logger.error(
+                    f"Function {func.__name__} failed after {max_retries} attempts",
+                    error=str(e)
+                )
+                return None
+
+            wait_time = delays[attempt]
+            logger.warning(
+                f"Attempt {attempt + 1} failed for {func.__name__}, retrying in {wait_time}s",
+                error=str(e)
+            )
+            return wait_time
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                last_exception = None
+
+                for attempt in range(max_retries):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as e:
+                        last_exception = e
+                        wait_time = on_failure(attempt, e)
+                        if wait_time is None:
+                            break
+                        await asyncio.sleep(wait_time)
+
+                raise last_exception
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             last_exception = None
@@ -44,20 +91,11 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
-                except Exception as e:
+                except exceptions as e:
                     last_exception = e
-                    if attempt == max_retries - 1:
-                        logger.error(
-                            f"Function {func.__name__} failed after {max_retries} attempts",
-                            error=str(e)
-                        )
+                    wait_time = on_failure(attempt, e)
+                    if wait_time is None:
                         break
-                    
-                    wait_time = delay * (2 ** attempt)  # 指数退避
-                    logger.warning(
-                        f"Attempt {attempt + 1} failed for {func.__name__}, retrying in {wait_time}s",
-                        error=str(e)
-                    )
                     time.sleep(wait_time)
             
             raise last_exception
@@ -69,120 +107,64 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
 # 重构后的Agent工具函数 - 使用新的管理器架构
 # ============================================================================
 
-# 全局管理器实例
-_data_strategy = None
-_notification_manager = None
-_execution_tracker = None
-
+# 全局管理器实例 - lru_cache(maxsize=1) 保证只创建一次，热路径上免去 None 判断
+@lru_cache(maxsize=1)
 def get_data_strategy() -> BusinessDataStrategy:
     """获取业务数据策略实例"""
-    global _data_strategy
-    if _data_strategy is None:
-        _data_strategy = BusinessDataStrategy()
-    return _data_strategy
+    return BusinessDataStrategy()
 
+@lru_cache(maxsize=1)
 def get_notification_manager() -> NotificationTaskManager:
     """获取通知任务管理器实例"""
-    global _notification_manager
-    if _notification_manager is None:
-        _notification_manager = NotificationTaskManager()
-    return _notification_manager
+    return NotificationTaskManager(get_data_strategy())
 
+@lru_cache(maxsize=1)
 def get_execution_tracker() -> AgentExecutionTracker:
     """获取执行追踪器实例"""
-    global _execution_tracker
-    if _execution_tracker is None:
-        _execution_tracker = AgentExecutionTracker()
-    return _execution_tracker
-
+    return AgentExecutionTracker()
 
-# ============================================================================
-# 废弃的函数 - 仅保留用于向后兼容，请使用新的商机相关接口
-# ============================================================================
 
-@log_function_call
-def update_task_status(task_id: int, status: str, comment: str = None) -> bool:
-    """
-    更新任务状态 - 已废弃
+def reset_managers():
+    """清除缓存的管理器实例，下次获取时重新创建，主要用于测试"""
+    get_data_strategy.cache_clear()
+    get_notification_manager.cache_clear()
+    get_execution_tracker.cache_clear()
 
-    ⚠️ 此函数已废弃，存在任务-商机概念混淆问题
 
-    推荐使用：
-    - 直接操作商机数据，而不是任务状态
-    - 使用NotificationTaskManager管理通知任务状态
+def reset_singletons():
+    """清除所有缓存的单例（配置、Metabase客户端、各管理器与健康检查探测结果），主要用于测试"""
+    get_config.cache_clear()
+    get_metabase_client.cache_clear()
+    reset_managers()
+    reset_health_probe_cache()
 
-    Args:
-        task_id: 任务ID（实际为商机数据的伪ID）
-        status: 新状态
-        comment: 备注信息
 
-    Returns:
-        是否更新成功
-    """
-    logger.warning(
-        "update_task_status() is deprecated due to task-opportunity concept confusion. "
-        "Use direct opportunity data operations instead."
-    )
-    # 此函数已完全废弃，不再执行任何操作
-    # 任务状态更新功能已迁移到商机数据和通知任务管理
-    logger.error(
-        f"update_task_status() is completely deprecated and no longer functional. "
-        f"Task ID {task_id} status update to '{status}' was ignored. "
-        f"Use direct opportunity data operations or NotificationTaskManager instead."
-    )
-    return False
+# 健康检查探测结果缓存 - 窗口期内重复的健康检查复用上次成功结果，避免反复发起网络往返
+HEALTH_PROBE_TTL_SECONDS = 30
+_health_probe_cache: Dict[str, Tuple[float, bool]] = {}
 
 
-@log_function_call
-def get_task_notification_history(task_id: int, hours_back: int = 24) -> List[NotificationInfo]:
-    """
-    获取任务通知历史 - 已彻底废弃
+def reset_health_probe_cache():
+    """清空健康检查探测缓存，配置变更后重新探测"""
+    _health_probe_cache.clear()
 
-    ⚠️ 此函数已彻底废弃，不再提供任何功能
 
-    原因：
-    - 存在任务-商机概念混淆问题
-    - 对应的notifications_deprecated表已被移除
-    - 新系统使用完全不同的数据结构
+# 缓存的成功结果基于旧配置，重新加载配置时清空
+register_reload_callback(reset_health_probe_cache)
 
-    推荐使用：
-    - NotificationTaskManager.get_notification_tasks_by_order() 查询工单通知记录
-    - DatabaseManager.get_agent_history_by_run() 查询执行历史
 
-    Args:
-        task_id: 任务ID（已无效）
-        hours_back: 查询时间范围（已无效）
+def _run_health_probe(name: str, probe: Callable[[], bool]) -> bool:
+    """执行健康检查探测 - TTL内命中成功结果直接返回，失败结果不缓存以便及时恢复"""
+    cached = _health_probe_cache.get(name)
+    if cached and time.monotonic() - cached[0] < HEALTH_PROBE_TTL_SECONDS:
+        return cached[1]
 
-    Returns:
-        空列表（不再提供数据）
-    """
-    logger.error(
-        "get_task_notification_history() is completely deprecated and no longer functional. "
-        "The underlying notifications_deprecated table has been removed. "
-        "Use NotificationTaskManager for notification queries."
-    )
-    return []  # 直接返回空列表，不再尝试查询
-
-
-def _check_notification_cooldown(task: TaskInfo) -> bool:
-    """
-    检查通知冷却时间 - 已废弃
-
-    ⚠️ 此函数已废弃，请使用NotificationTaskManager中的冷却检查逻辑
-
-    Args:
-        task: 任务信息（TaskInfo已废弃）
-
-    Returns:
-        是否可以发送通知
-    """
-    import warnings
-    warnings.warn(
-        "_check_notification_cooldown is deprecated. Use NotificationTaskManager instead.",
-        DeprecationWarning,
-        stacklevel=2
-    )
-    return True  # 简化实现，实际逻辑已迁移到NotificationTaskManager
+    result = probe()
+    if result:
+        _health_probe_cache[name] = (time.monotonic(), result)
+    else:
+        _health_probe_cache.pop(name, None)
+    return result
 
 
 @log_function_call
@@ -210,7 +192,6 @@ def test_deepseek_connection() -> bool:
         连接是否成功
     """
     try:
-        from .llm import get_deepseek_client
         deepseek_client = get_deepseek_client()
         return deepseek_client.test_connection()
     except Exception as e:
@@ -244,10 +225,9 @@ def test_wechat_webhook(group_id: str = None) -> bool:
             # 检查组织群配置
             has_org_groups = False
             try:
-                from ..data.database import get_database_manager
-                db_manager = get_database_manager()
+                db_manager = get_db_manager()
                 group_configs = db_manager.get_enabled_group_configs()
-                has_org_groups = len([gc for gc in group_configs if gc.webhook_url]) > 0
+                has_org_groups = any(gc.webhook_url for gc in group_configs)
             except Exception as e:
                 logger.warning(f"Failed to check organization webhooks: {e}")
 
@@ -273,8 +253,6 @@ def get_agent_execution_status() -> Dict[str, Any]:
         Agent执行状态信息
     """
     try:
-        from ..utils.scheduler import get_scheduler
-
         execution_tracker = get_execution_tracker()
         scheduler = get_scheduler()
 
@@ -296,16 +274,12 @@ def get_agent_execution_status() -> Dict[str, Any]:
         # 如果当前进程的调度器显示未运行，但有最近的执行记录，
         # 说明可能有其他进程的调度器在运行
         if not scheduler_running and last_run:
-            from datetime import datetime, timedelta
-            from ..utils.timezone_utils import now_china_naive
-
             # 如果最近有执行记录（在过去2小时内），认为调度器可能在运行
             time_since_last = now_china_naive() - last_run.trigger_time
             if time_since_last < timedelta(hours=2):
                 scheduler_running = True
 
         # 从数据库读取执行间隔
-        from ..data.database import get_db_manager
         db_manager = get_db_manager()
         interval_config = db_manager.get_system_config("agent_execution_interval")
         interval_minutes = int(interval_config) if interval_config else 60
@@ -326,22 +300,13 @@ def get_agent_execution_status() -> Dict[str, Any]:
             status["last_execution_status"] = last_run.status.value
 
         # 设置下次执行时间
-        if agent_job and agent_job["next_run_time"]:
-            try:
-                from datetime import datetime
-                next_time = datetime.fromisoformat(agent_job["next_run_time"].replace('Z', '+00:00'))
-                # 转换为中国时区显示
-                from ..utils.timezone_utils import utc_to_china
-                next_time_china = utc_to_china(next_time)
-                status["next_execution"] = next_time_china.strftime("%Y-%m-%d %H:%M:%S")
-            except Exception as e:
-                logger.warning(f"Failed to parse next execution time: {e}")
-                status["next_execution"] = "解析失败"
+        if agent_job and agent_job.get("next_run_at"):
+            # 转换为中国时区显示
+            status["next_execution"] = utc_to_china(agent_job["next_run_at"]).strftime("%Y-%m-%d %H:%M:%S")
         else:
             # 如果没有调度器信息，基于上次执行时间和间隔估算
             if last_run and last_run.status.value == "completed":
                 try:
-                    from datetime import timedelta
                     next_estimated = last_run.trigger_time + timedelta(minutes=interval_minutes)
                     status["next_execution"] = next_estimated.strftime("%Y-%m-%d %H:%M:%S") + " (估算)"
                 except Exception:
@@ -437,34 +402,30 @@ def get_system_health() -> Dict[str, Any]:
     }
     
     try:
-        # 测试Metabase连接
-        health_status["metabase_connection"] = test_metabase_connection()
-
-        # 测试企微Webhook
-        health_status["wechat_webhook"] = test_wechat_webhook()
+        # Metabase、企微Webhook、DeepSeek 连接测试均为独立的网络往返，并发执行
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="fsoa-health") as executor:
+            metabase_future = executor.submit(_run_health_probe, "metabase", test_metabase_connection)
+            wechat_future = executor.submit(_run_health_probe, "wechat", test_wechat_webhook)
+            deepseek_future = executor.submit(_run_health_probe, "deepseek", test_deepseek_connection)
 
-        # 测试DeepSeek连接
-        health_status["deepseek_connection"] = test_deepseek_connection()
+            health_status["metabase_connection"] = metabase_future.result()
+            health_status["wechat_webhook"] = wechat_future.result()
+            health_status["deepseek_connection"] = deepseek_future.result()
 
         # 测试数据库连接
         db_manager = get_db_manager()
         health_status["database_connection"] = True  # 如果能获取到manager说明连接正常
         
         # 计算整体状态
-        if all([
-            health_status["metabase_connection"],
-            health_status["wechat_webhook"],
-            health_status["deepseek_connection"],
-            health_status["database_connection"]
-        ]):
+        if (health_status["database_connection"] and
+                health_status["metabase_connection"] and
+                health_status["wechat_webhook"] and
+                health_status["deepseek_connection"]):
             health_status["overall_status"] = "healthy"
-        elif any([
-            health_status["metabase_connection"],
-            health_status["database_connection"]
-        ]):
+        elif health_status["database_connection"] or health_status["metabase_connection"]:
             health_status["overall_status"] = "degraded"
         
-        logger.info("System health check completed", **health_status)
+        logger.info("System health check completed: %s", health_status)
         return health_status
         
     except Exception as e:
@@ -501,7 +462,7 @@ def send_business_notifications(opportunities: List[OpportunityInfo], run_id: Op
         tasks = notification_manager.create_notification_tasks(opportunities, run_id)
 
         # 执行通知任务
-        result = notification_manager.execute_pending_tasks(run_id)
+        result = notification_manager.execute_pending_tasks(run_id, opportunities)
 
         # 转换结果格式以保持兼容性
         return {
@@ -587,19 +548,21 @@ def create_notification_tasks(opportunities: List[OpportunityInfo], run_id: int)
 
 
 @log_function_call
-def execute_notification_tasks(run_id: int) -> Dict[str, Any]:
+def execute_notification_tasks(run_id: int,
+                               opportunities: Optional[List[OpportunityInfo]] = None) -> Dict[str, Any]:
     """
     执行待处理的通知任务
 
     Args:
         run_id: Agent运行ID
+        opportunities: 本次运行已获取的商机，发送时优先使用
 
     Returns:
         执行结果统计
     """
     try:
         notification_manager = get_notification_manager()
-        result = notification_manager.execute_pending_tasks(run_id)
+        result = notification_manager.execute_pending_tasks(run_id, opportunities)
 
         # 转换为字典格式返回
         return {
@@ -624,50 +587,37 @@ def get_opportunity_statistics() -> Dict[str, Any]:
     try:
         data_strategy = get_data_strategy()
 
-        # 获取所有商机
+        # 获取所有商机（逾期情况在本地统计，不再单独获取逾期商机）
         all_opportunities = data_strategy.get_opportunities(force_refresh=False)
 
-        # 获取逾期商机
-        overdue_opportunities = data_strategy.get_overdue_opportunities(force_refresh=False)
-
         # 基础统计
         total_count = len(all_opportunities)
-        overdue_count = len(overdue_opportunities)
-        normal_count = total_count - overdue_count
+        overdue_count = 0
 
         # 计算即将逾期的商机（这里简化处理，可以根据业务需求调整）
         approaching_overdue_count = 0
         escalation_count = 0
 
-        # 统计需要升级的商机
-        for opp in overdue_opportunities:
-            if hasattr(opp, 'escalation_level') and opp.escalation_level > 0:
-                escalation_count += 1
-
-        # 组织统计
-        organization_breakdown = {}
+        # 单次遍历同时统计逾期数量、组织分布、状态分布与升级数量
+        organization_breakdown = defaultdict(lambda: {"total": 0, "overdue": 0, "normal": 0})
+        status_breakdown = Counter()
         for opp in all_opportunities:
-            org_name = opp.org_name or "未知组织"
-            if org_name not in organization_breakdown:
-                organization_breakdown[org_name] = {
-                    "total": 0,
-                    "overdue": 0,
-                    "normal": 0
-                }
-            organization_breakdown[org_name]["total"] += 1
-
-            # 检查是否逾期
-            is_overdue = any(o.order_num == opp.order_num for o in overdue_opportunities)
-            if is_overdue:
-                organization_breakdown[org_name]["overdue"] += 1
+            org_stats = organization_breakdown[opp.org_name or "未知组织"]
+            org_stats["total"] += 1
+
+            # 检查是否逾期，逾期商机中统计需要升级的数量
+            if opp.is_overdue:
+                overdue_count += 1
+                org_stats["overdue"] += 1
+                if opp.escalation_level:
+                    escalation_count += 1
             else:
-                organization_breakdown[org_name]["normal"] += 1
+                org_stats["normal"] += 1
 
-        # 状态统计
-        status_breakdown = {}
-        for opp in all_opportunities:
-            status = opp.order_status or "未知状态"
-            status_breakdown[status] = status_breakdown.get(status, 0) + 1
+            # 状态统计
+            status_breakdown[opp.order_status or "未知状态"] += 1
+
+        normal_count = total_count - overdue_count
 
         # 计算比例
         overdue_rate = (overdue_count / total_count * 100) if total_count > 0 else 0
@@ -681,8 +631,8 @@ def get_opportunity_statistics() -> Dict[str, Any]:
             "escalation_count": escalation_count,
             "overdue_rate": overdue_rate,
             "approaching_rate": approaching_rate,
-            "organization_breakdown": organization_breakdown,
-            "status_breakdown": status_breakdown,
+            "organization_breakdown": dict(organization_breakdown),
+            "status_breakdown": dict(status_breakdown),
             "organization_count": len(organization_breakdown)
         }
 
@@ -765,27 +715,29 @@ def get_data_statistics() -> Dict[str, Any]:
     获取数据统计信息
 
     Returns:
-        数据统计信息
+        数据统计信息；尚无数据时各项为0且statistics_available为False
     """
     try:
         data_strategy = get_data_strategy()
         cache_stats = data_strategy.get_cache_statistics()
 
-        # 获取基本统计
-        all_opportunities = data_strategy.get_opportunities()
-        overdue_opportunities = [opp for opp in all_opportunities if opp.is_overdue]
-        escalation_opportunities = [opp for opp in overdue_opportunities if opp.escalation_level > 0]
+        # 基本统计随最新数据一同生成；尚无快照时基于本地缓存生成，不请求Metabase
+        snapshot = data_strategy.get_statistics_snapshot(build_from_cache=True)
+        if snapshot is None:
+            # 缓存未启用或为空：返回空统计，待Agent运行或刷新缓存后生成
+            logger.info("No statistics snapshot available yet")
 
         stats = {
-            "total_opportunities": len(all_opportunities),
-            "overdue_opportunities": len(overdue_opportunities),
-            "escalation_opportunities": len(escalation_opportunities),
-            "organizations": len(set(opp.org_name for opp in all_opportunities)),
+            "total_opportunities": snapshot["total_opportunities"] if snapshot else 0,
+            "overdue_opportunities": snapshot["overdue_opportunities"] if snapshot else 0,
+            "escalation_opportunities": snapshot["escalation_opportunities"] if snapshot else 0,
+            "organizations": snapshot["organizations"] if snapshot else 0,
             "cache_statistics": cache_stats,
-            "last_updated": datetime.now()
+            "statistics_available": snapshot is not None,
+            "last_updated": snapshot["snapshot_time"] if snapshot else None
         }
 
-        logger.info(f"Data statistics: {stats}")
+        logger.info("Data statistics: %s", stats)
         return stats
 
     except Exception as e:
@@ -812,7 +764,7 @@ def refresh_business_data() -> Dict[str, Any]:
             "refresh_time": datetime.now()
         }
 
-        logger.info(f"Business data refreshed: {result}")
+        logger.info("Business data refreshed: %s", result)
         return result
 
     except Exception as e:
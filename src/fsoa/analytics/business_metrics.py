@@ -277,8 +277,8 @@ class BusinessMetricsCalculator:
                 "总商机数": len(opportunities),
                 "逾期商机数": sum(1 for opp in opportunities if opp.is_overdue),
                 "升级商机数": sum(1 for opp in opportunities if opp.escalation_level > 0),
-                "涉及组织数": len(set(opp.org_name for opp in opportunities)),
-                "涉及负责人数": len(set(opp.supervisor_name for opp in opportunities))
+                "涉及组织数": len({opp.org_name for opp in opportunities}),
+                "涉及负责人数": len({opp.supervisor_name for opp in opportunities})
             },
             "逾期率分析": calculator.calculate_overdue_rate(opportunities),
             "平均处理时长": calculator.calculate_average_processing_time(opportunities),
@@ -7,9 +7,9 @@
 import os
 import sqlite3
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from contextlib import contextmanager
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, JSON, Index
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, JSON, Index, and_, or_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
@@ -26,6 +26,9 @@ from .models import (
 
 logger = get_logger(__name__)
 
+# 通知任务认领租约（分钟）- 超时仍处于SENDING的任务视为运行异常退出，可被回收
+NOTIFICATION_CLAIM_LEASE_MINUTES = 30
+
 Base = declarative_base()
 
 
@@ -72,7 +75,7 @@ class NotificationTaskTable(Base):
     org_name = Column(String(255), nullable=False)  # 组织名称
     notification_type = Column(String(100), nullable=False)  # 'violation', 'standard', 'escalation'
     due_time = Column(DateTime, nullable=False)  # 应该通知的时间
-    status = Column(String(50), default='pending')  # 'pending', 'sent', 'failed', 'confirmed'
+    status = Column(String(50), default='pending')  # 'pending', 'sending', 'sent', 'failed', 'confirmed'
     message = Column(Text)  # 通知内容
     sent_at = Column(DateTime)  # 实际发送时间
     created_run_id = Column(Integer)  # 创建此任务的Agent运行ID
@@ -81,6 +84,11 @@ class NotificationTaskTable(Base):
     created_at = Column(DateTime, nullable=False, default=now_china_naive)
     updated_at = Column(DateTime, nullable=False, default=now_china_naive)
 
+    __table_args__ = (
+        # 待处理任务查询与按创建时间清理旧任务都走此索引，避免全表扫描
+        Index('idx_notification_tasks_status_created', 'status', 'created_at'),
+    )
+
 
 class OpportunityCacheTable(Base):
     """业务数据缓存表 - Agent和业务系统关联的证明"""
@@ -164,6 +172,11 @@ class DatabaseManager:
         """初始化数据库"""
         try:
             Base.metadata.create_all(bind=self.engine)
+
+            # create_all 不会为已存在的表补建索引，这里单独检查创建
+            for index in NotificationTaskTable.__table__.indexes:
+                index.create(bind=self.engine, checkfirst=True)
+
             logger.info("Database initialized successfully")
             
             # 初始化默认配置
@@ -180,6 +193,7 @@ class DatabaseManager:
             ("agent_max_retries", "3", "Agent最大重试次数"),
             ("notification_cooldown", "30", "通知冷却时间（分钟）"),
             ("webhook_api_interval", "3", "Webhook API发送间隔（秒）"),
+            ("webhook_max_concurrency", "5", "同时发送通知的组织数上限（同一Webhook仍串行）"),
             ("use_llm_optimization", "true", "是否使用LLM优化"),
             ("llm_temperature", "0.1", "LLM温度参数"),
 
@@ -344,6 +358,33 @@ class DatabaseManager:
             logger.error(f"Failed to save agent history: {e}")
             return False
 
+    def save_agent_histories(self, histories: List['AgentHistory']) -> bool:
+        """批量保存Agent执行历史 - 单个事务内一次提交"""
+        if not histories:
+            return True
+
+        try:
+            with self.get_session() as session:
+                now = now_china_naive()
+                session.add_all([
+                    AgentHistoryTable(
+                        run_id=history.run_id,
+                        step_name=history.step_name,
+                        input_data=history.input_data,
+                        output_data=history.output_data,
+                        timestamp=history.timestamp,
+                        duration_seconds=history.duration_seconds,
+                        error_message=history.error_message,
+                        created_at=history.created_at or now
+                    )
+                    for history in histories
+                ])
+                session.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Failed to save {len(histories)} agent history records: {e}")
+            return False
+
     def get_agent_runs(self, limit: int = 50, hours_back: int = 168) -> List['AgentRun']:
         """获取Agent执行记录列表"""
         try:
@@ -356,27 +397,38 @@ class DatabaseManager:
                     .limit(limit)\
                     .all()
 
-                result = []
-                for run in runs:
-                    agent_run = AgentRun(
-                        id=run.id,
-                        trigger_time=run.trigger_time,
-                        end_time=run.end_time,
-                        status=AgentRunStatus(run.status),
-                        context=run.context or {},
-                        opportunities_processed=run.opportunities_processed,
-                        notifications_sent=run.notifications_sent,
-                        errors=run.errors or [],
-                        created_at=run.created_at
-                    )
-                    result.append(agent_run)
-
-                return result
+                return [self._build_agent_run(run) for run in runs]
 
         except Exception as e:
             logger.error(f"Failed to get agent runs: {e}")
             return []
 
+    def get_agent_run(self, run_id: int) -> Optional['AgentRun']:
+        """按ID获取单条Agent执行记录 - 主键查询，无需加载执行记录列表"""
+        try:
+            with self.get_session() as session:
+                run = session.query(AgentRunTable).filter_by(id=run_id).first()
+                return self._build_agent_run(run) if run else None
+
+        except Exception as e:
+            logger.error(f"Failed to get agent run {run_id}: {e}")
+            return None
+
+    @staticmethod
+    def _build_agent_run(run: AgentRunTable) -> 'AgentRun':
+        """将数据库记录转换为Agent执行记录模型"""
+        return AgentRun(
+            id=run.id,
+            trigger_time=run.trigger_time,
+            end_time=run.end_time,
+            status=AgentRunStatus(run.status),
+            context=run.context or {},
+            opportunities_processed=run.opportunities_processed,
+            notifications_sent=run.notifications_sent,
+            errors=run.errors or [],
+            created_at=run.created_at
+        )
+
     def get_agent_run_statistics(self, hours_back: int = 24) -> Dict[str, Any]:
         """获取Agent运行统计信息"""
         try:
@@ -505,24 +557,29 @@ class DatabaseManager:
             logger.error(f"Failed to get step performance statistics: {e}")
             return {}
 
+    @staticmethod
+    def _build_notification_task_record(task: 'NotificationTask', now: datetime) -> NotificationTaskTable:
+        """将通知任务模型转换为数据库记录"""
+        return NotificationTaskTable(
+            order_num=task.order_num,
+            org_name=task.org_name,
+            notification_type=task.notification_type.value,
+            due_time=task.due_time,
+            status=task.status.value,
+            message=task.message,
+            sent_at=task.sent_at,
+            created_run_id=task.created_run_id,
+            sent_run_id=task.sent_run_id,
+            retry_count=task.retry_count,
+            created_at=task.created_at or now,
+            updated_at=task.updated_at or now
+        )
+
     def save_notification_task(self, task: 'NotificationTask') -> int:
         """保存通知任务"""
         try:
             with self.get_session() as session:
-                task_record = NotificationTaskTable(
-                    order_num=task.order_num,
-                    org_name=task.org_name,
-                    notification_type=task.notification_type.value,
-                    due_time=task.due_time,
-                    status=task.status.value,
-                    message=task.message,
-                    sent_at=task.sent_at,
-                    created_run_id=task.created_run_id,
-                    sent_run_id=task.sent_run_id,
-                    retry_count=task.retry_count,
-                    created_at=task.created_at or now_china_naive(),
-                    updated_at=task.updated_at or now_china_naive()
-                )
+                task_record = self._build_notification_task_record(task, now_china_naive())
                 session.add(task_record)
                 session.commit()
                 session.refresh(task_record)
@@ -531,6 +588,29 @@ class DatabaseManager:
             logger.error(f"Failed to save notification task: {e}")
             raise
 
+    def save_notification_tasks(self, tasks: List['NotificationTask']) -> List[int]:
+        """批量保存通知任务 - 单个事务内一次性插入
+
+        Returns:
+            与传入顺序一致的任务ID列表
+        """
+        if not tasks:
+            return []
+
+        try:
+            with self.get_session() as session:
+                now = now_china_naive()
+                task_records = [self._build_notification_task_record(task, now) for task in tasks]
+                session.add_all(task_records)
+                # flush 以批量 INSERT 的方式写入并回填主键，随后一次提交
+                session.flush()
+                task_ids = [record.id for record in task_records]
+                session.commit()
+                return task_ids
+        except Exception as e:
+            logger.error(f"Failed to save {len(tasks)} notification tasks: {e}")
+            raise
+
     def get_pending_notification_tasks(self) -> List['NotificationTask']:
         """获取待处理的通知任务"""
         try:
@@ -565,6 +645,132 @@ class DatabaseManager:
             logger.error(f"Failed to get pending notification tasks: {e}")
             return []
 
+    @staticmethod
+    def _active_task_filter(now: datetime):
+        """进行中任务条件：待发送，或租约未过期的发送中任务（租约过期视为运行异常退出）"""
+        return or_(
+            NotificationTaskTable.status == NotificationTaskStatus.PENDING.value,
+            and_(
+                NotificationTaskTable.status == NotificationTaskStatus.SENDING.value,
+                NotificationTaskTable.updated_at >= now - timedelta(minutes=NOTIFICATION_CLAIM_LEASE_MINUTES)
+            )
+        )
+
+    def get_active_notification_keys(self) -> Set[Tuple[str, 'NotificationTaskType']]:
+        """获取进行中任务（待发送或发送中）的 (订单号, 通知类型) 集合 - 批量去重检查用，单次查询"""
+        try:
+            with self.get_session() as session:
+                from .models import NotificationTaskType
+
+                rows = session.query(
+                    NotificationTaskTable.order_num,
+                    NotificationTaskTable.notification_type
+                ).filter(
+                    self._active_task_filter(now_china_naive()),
+                    NotificationTaskTable.notification_type.in_([t.value for t in NotificationTaskType])
+                ).distinct().all()
+
+                return {(order_num, NotificationTaskType(notification_type)) for order_num, notification_type in rows}
+        except Exception as e:
+            logger.error(f"Failed to get active notification keys: {e}")
+            raise
+
+    def has_active_escalation_task(self, org_name: str) -> bool:
+        """检查组织是否有进行中（待发送或发送中）的升级任务"""
+        try:
+            with self.get_session() as session:
+                from .models import NotificationTaskType
+
+                return session.query(NotificationTaskTable.id).filter(
+                    NotificationTaskTable.org_name == org_name,
+                    NotificationTaskTable.notification_type == NotificationTaskType.ESCALATION.value,
+                    self._active_task_filter(now_china_naive())
+                ).first() is not None
+        except Exception as e:
+            logger.error(f"Failed to check active escalation task for org {org_name}: {e}")
+            raise
+
+    def reclaim_expired_notification_claims(self) -> int:
+        """回收租约过期的发送中任务 - 运行异常退出后仍处于SENDING的任务回退为PENDING
+
+        Returns:
+            回收的任务数量
+        """
+        try:
+            with self.get_session() as session:
+                now = now_china_naive()
+                reclaimed = session.query(NotificationTaskTable).filter(
+                    NotificationTaskTable.status == NotificationTaskStatus.SENDING.value,
+                    NotificationTaskTable.updated_at < now - timedelta(minutes=NOTIFICATION_CLAIM_LEASE_MINUTES)
+                ).update(
+                    {"status": NotificationTaskStatus.PENDING.value, "sent_run_id": None, "updated_at": now},
+                    synchronize_session=False
+                )
+                session.commit()
+                return reclaimed
+        except Exception as e:
+            logger.error(f"Failed to reclaim expired notification claims: {e}")
+            raise
+
+    def claim_notification_tasks(self, task_ids: List[int], run_id: int) -> List[int]:
+        """认领待发送任务 - 条件UPDATE将PENDING置为SENDING，并发运行互不重复领取
+
+        SQLite不支持 FOR UPDATE SKIP LOCKED，这里依赖单条UPDATE的原子性：
+        只有仍为PENDING的行会被本次运行认领。租约过期任务的回收见
+        reclaim_expired_notification_claims。
+
+        Returns:
+            本次运行成功认领的任务ID列表
+        """
+        if not task_ids:
+            return []
+
+        try:
+            with self.get_session() as session:
+                now = now_china_naive()
+                sending = NotificationTaskStatus.SENDING.value
+                pending = NotificationTaskStatus.PENDING.value
+
+                session.query(NotificationTaskTable).filter(
+                    NotificationTaskTable.id.in_(task_ids),
+                    NotificationTaskTable.status == pending
+                ).update(
+                    {"status": sending, "sent_run_id": run_id, "updated_at": now},
+                    synchronize_session=False
+                )
+                session.commit()
+
+                claimed = session.query(NotificationTaskTable.id).filter(
+                    NotificationTaskTable.id.in_(task_ids),
+                    NotificationTaskTable.status == sending,
+                    NotificationTaskTable.sent_run_id == run_id
+                ).all()
+                return [row.id for row in claimed]
+        except Exception as e:
+            logger.error(f"Failed to claim notification tasks for run {run_id}: {e}")
+            raise
+
+    def release_notification_tasks(self, run_id: int) -> int:
+        """释放本次运行认领但未完成的任务（如待重试），回退为PENDING并清除认领的运行ID"""
+        try:
+            with self.get_session() as session:
+                released = session.query(NotificationTaskTable).filter(
+                    NotificationTaskTable.status == NotificationTaskStatus.SENDING.value,
+                    NotificationTaskTable.sent_run_id == run_id
+                ).update(
+                    {
+                        "status": NotificationTaskStatus.PENDING.value,
+                        "sent_run_id": None,
+                        "updated_at": now_china_naive()
+                    },
+                    synchronize_session=False
+                )
+                session.commit()
+                return released
+        except Exception as e:
+            logger.error(f"Failed to release notification tasks for run {run_id}: {e}")
+            return 0
+
     def update_notification_task_status(self, task_id: int, status: 'NotificationTaskStatus',
                                       sent_run_id: Optional[int] = None) -> bool:
         """更新通知任务状态"""
@@ -585,6 +791,34 @@ class DatabaseManager:
             logger.error(f"Failed to update notification task {task_id}: {e}")
             return False
 
+    def update_notification_tasks_status(self, task_ids: List[int], status: 'NotificationTaskStatus',
+                                         sent_run_id: Optional[int] = None) -> int:
+        """批量更新通知任务状态 - 单条UPDATE、单次提交，语义同 update_notification_task_status
+
+        Returns:
+            更新的任务数
+        """
+        if not task_ids:
+            return 0
+
+        try:
+            with self.get_session() as session:
+                now = now_china_naive()
+                values = {"status": status.value, "updated_at": now}
+                if status.value == 'sent':
+                    values["sent_at"] = now
+                    if sent_run_id:
+                        values["sent_run_id"] = sent_run_id
+
+                updated = session.query(NotificationTaskTable).filter(
+                    NotificationTaskTable.id.in_(task_ids)
+                ).update(values, synchronize_session=False)
+                session.commit()
+                return updated
+        except Exception as e:
+            logger.error(f"Failed to update {len(task_ids)} notification tasks: {e}")
+            return 0
+
     def update_notification_task_retry_info(self, task_id: int, retry_count: int,
                                           last_sent_at: Optional[datetime] = None) -> bool:
         """更新通知任务重试信息"""
@@ -623,6 +857,27 @@ class DatabaseManager:
             logger.error(f"Failed to update notification task message {task_id}: {e}")
             return False
 
+    def update_notification_tasks_message(self, task_ids: List[int], message: str) -> int:
+        """批量更新通知任务消息内容 - 同一批次共用一条消息，单条UPDATE、单次提交
+
+        Returns:
+            更新的任务数
+        """
+        if not task_ids:
+            return 0
+
+        try:
+            with self.get_session() as session:
+                updated = session.query(NotificationTaskTable).filter(
+                    NotificationTaskTable.id.in_(task_ids)
+                ).update({"message": message, "updated_at": now_china_naive()}, synchronize_session=False)
+                session.commit()
+                logger.info(f"Updated message for {updated} notification tasks")
+                return updated
+        except Exception as e:
+            logger.error(f"Failed to update message for {len(task_ids)} notification tasks: {e}")
+            return 0
+
     def get_recent_notification_tasks(self, order_num: str, since: datetime,
                                     notification_type: str = None) -> List['NotificationTask']:
         """获取指定订单在指定时间之后的通知任务
@@ -672,6 +927,27 @@ class DatabaseManager:
             logger.error(f"Failed to get recent notification tasks for {order_num}: {e}")
             return []
 
+    def get_recent_notification_keys(self, since: datetime) -> Set[Tuple[str, 'NotificationTaskType']]:
+        """获取指定时间之后已发送通知的 (订单号, 通知类型) 集合 - 批量冷却期检查用，单次查询"""
+        try:
+            with self.get_session() as session:
+                from .models import NotificationTaskType
+
+                rows = session.query(
+                    NotificationTaskTable.order_num,
+                    NotificationTaskTable.notification_type
+                ).filter(
+                    NotificationTaskTable.sent_at >= since,
+                    NotificationTaskTable.status.in_(['sent', 'confirmed']),
+                    # 只取当前可识别的类型，个别旧数据的类型值不会导致整批冷却检查失效
+                    NotificationTaskTable.notification_type.in_([t.value for t in NotificationTaskType])
+                ).distinct().all()
+
+                return {(order_num, NotificationTaskType(notification_type)) for order_num, notification_type in rows}
+        except Exception as e:
+            logger.error(f"Failed to get recent notification keys: {e}")
+            return set()
+
     def save_opportunity_cache(self, opportunity: 'OpportunityInfo') -> bool:
         """
         保存商机缓存 - 兼容性方法
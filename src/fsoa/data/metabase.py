@@ -5,12 +5,14 @@ Metabase集成模块
 """
 
 import requests
+import threading
+from functools import lru_cache
 from typing import List, Dict, Any
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from ..utils.logger import get_logger
-from ..utils.config import get_config
+from ..utils.config import get_config, register_reload_callback
 from .models import OpportunityInfo, OpportunityStatus
 
 logger = get_logger(__name__)
@@ -30,6 +32,8 @@ class MetabaseClient:
         self.password = password
         self.session_token = None
         self.session = self._create_session()
+        # 客户端在线程间共享，令牌过期时只允许一个线程重新认证
+        self._auth_lock = threading.Lock()
         
     def _create_session(self) -> requests.Session:
         """创建HTTP会话"""
@@ -81,6 +85,21 @@ class MetabaseClient:
             logger.error(f"Unexpected error during Metabase authentication: {e}")
             return False
     
+    def _post_authenticated(self, url: str, **kwargs) -> requests.Response:
+        """发送需认证的POST请求 - 客户端长期复用，会话令牌过期（401）时重新认证并重试一次"""
+        token = self.session_token
+        response = self.session.post(url, **kwargs)
+        if response.status_code == 401:
+            with self._auth_lock:
+                # 等待锁期间其他线程已重新认证时，直接使用新令牌重试
+                refreshed = self.session_token != token
+                if not refreshed:
+                    logger.info("Metabase session expired, re-authenticating")
+                    refreshed = self.authenticate()
+            if refreshed:
+                response = self.session.post(url, **kwargs)
+        return response
+
     def query_database(self, query: str, database_id: int = 1, 
                       parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """执行数据库查询"""
@@ -99,7 +118,7 @@ class MetabaseClient:
                 }
             }
             
-            response = self.session.post(query_url, json=query_data, timeout=60)
+            response = self._post_authenticated(query_url, json=query_data, timeout=60)
             response.raise_for_status()
             
             result = response.json()
@@ -131,7 +150,7 @@ class MetabaseClient:
         try:
             card_url = f"{self.base_url}/api/card/{card_id}/query"
 
-            response = self.session.post(card_url, timeout=60)
+            response = self._post_authenticated(card_url, timeout=60)
             response.raise_for_status()
 
             result = response.json()
@@ -199,6 +218,7 @@ class MetabaseClient:
         try:
             raw_opportunities = self.get_field_service_opportunities()
             opportunities = []
+            sla_config = OpportunityInfo.load_sla_config()  # SLA阈值配置只读取一次
 
             for raw_opp in raw_opportunities:
                 try:
@@ -206,7 +226,7 @@ class MetabaseClient:
                     opportunity = self._convert_raw_opportunity_to_model(raw_opp)
 
                     # 更新逾期信息
-                    opportunity.update_overdue_info()
+                    opportunity.update_overdue_info(sla_config=sla_config)
 
                     # 只返回需要监控的商机（有SLA阈值的状态）
                     if opportunity.sla_threshold_hours and opportunity.sla_threshold_hours > 0:
@@ -306,11 +326,16 @@ class MetabaseClient:
             return False
 
 
+@lru_cache(maxsize=1)
 def get_metabase_client() -> MetabaseClient:
-    """获取Metabase客户端实例"""
+    """获取Metabase客户端实例 - 进程内共享，复用HTTP连接池与会话令牌"""
     config = get_config()
     return MetabaseClient(
         base_url=config.metabase_url,
         username=config.metabase_username,
         password=config.metabase_password
     )
+
+
+# 客户端基于配置创建，重新加载配置时清除以使用新的地址与凭据
+register_reload_callback(get_metabase_client.cache_clear)
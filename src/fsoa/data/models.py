@@ -27,6 +27,7 @@ class AgentRunStatus(str, Enum):
 class NotificationTaskStatus(str, Enum):
     """通知任务状态枚举"""
     PENDING = "pending"
+    SENDING = "sending"      # 已被某次运行认领，发送中
     SENT = "sent"
     FAILED = "failed"
     CONFIRMED = "confirmed"
@@ -165,28 +166,42 @@ class NotificationTask(BaseModel):
     @property
     def is_in_cooldown(self) -> bool:
         """是否在冷静期内"""
+        return self._in_cooldown(now_china_naive())
+
+    @property
+    def can_retry(self) -> bool:
+        """是否可以重试"""
+        return self._can_retry(now_china_naive())
+
+    def _in_cooldown(self, now: datetime) -> bool:
+        """指定时间是否处于冷静期内"""
         if not self.last_sent_at:
             return False
 
         cooldown_delta = timedelta(hours=self.cooldown_hours)
-        return now_china_naive() - self.last_sent_at < cooldown_delta
+        return now - self.last_sent_at < cooldown_delta
 
-    @property
-    def can_retry(self) -> bool:
-        """是否可以重试"""
-        return self.retry_count < self.max_retry_count and not self.is_in_cooldown
+    def _can_retry(self, now: datetime) -> bool:
+        """指定时间是否可以重试"""
+        return self.retry_count < self.max_retry_count and not self._in_cooldown(now)
 
-    def should_send_now(self) -> bool:
-        """是否应该立即发送"""
+    def should_send_now(self, now: Optional[datetime] = None) -> bool:
+        """是否应该立即发送
+
+        Args:
+            now: 当前时间，批量判断时由调用方传入同一时间戳，未提供时取当前时间
+        """
         if not self.is_pending:
             return False
 
+        now = now or now_china_naive()
+
         # 如果是第一次发送
         if self.retry_count == 0:
-            return now_china_naive() >= self.due_time
+            return now >= self.due_time
 
-        # 如果是重试，需要检查冷静时间
-        return self.can_retry and not self.is_in_cooldown
+        # 如果是重试，需要检查重试次数和冷静时间
+        return self._can_retry(now)
 
 
 # ============================================================================
@@ -376,7 +391,18 @@ class OpportunityInfo(BaseModel):
 
         return self.elapsed_hours
 
-    def get_sla_threshold(self, threshold_type: str = "reminder") -> int:
+    @staticmethod
+    def load_sla_config() -> Dict[str, str]:
+        """一次性读取系统配置，供批量计算逾期信息时传入 sla_config，避免逐个商机查询数据库"""
+        try:
+            from .database import get_database_manager
+            return get_database_manager().get_all_system_configs()
+        except Exception:
+            # 数据库不可用时返回空配置，阈值使用默认值
+            return {}
+
+    def get_sla_threshold(self, threshold_type: str = "reminder",
+                          sla_config: Optional[Dict[str, str]] = None) -> int:
         """
         获取SLA阈值 - 两级体系
 
@@ -384,15 +410,13 @@ class OpportunityInfo(BaseModel):
             threshold_type: 阈值类型
                 - "reminder": 提醒阈值（4/8小时）→ 服务商群
                 - "escalation": 升级阈值（8/16小时）→ 运营群
+            sla_config: 预先读取的系统配置（见 load_sla_config），未提供时查询数据库
 
         Returns:
             SLA阈值（工作小时）
         """
         # 尝试从数据库获取配置
         try:
-            from .database import get_database_manager
-            db_manager = get_database_manager()
-
             if self.order_status == OpportunityStatus.PENDING_APPOINTMENT:
                 config_key = f"sla_pending_{threshold_type}"
             elif self.order_status == OpportunityStatus.TEMPORARILY_NOT_VISITING:
@@ -400,7 +424,11 @@ class OpportunityInfo(BaseModel):
             else:
                 return 0  # 其他状态不需要监控
 
-            config_value = db_manager.get_system_config(config_key)
+            if sla_config is not None:
+                config_value = sla_config.get(config_key)
+            else:
+                from .database import get_database_manager
+                config_value = get_database_manager().get_system_config(config_key)
             if config_value:
                 return int(config_value)
 
@@ -418,12 +446,14 @@ class OpportunityInfo(BaseModel):
 
         return defaults.get(threshold_type, 0)
 
-    def check_overdue_status(self, use_business_time: bool = True) -> tuple[bool, bool, bool, float, int, float]:
+    def check_overdue_status(self, use_business_time: bool = True,
+                             sla_config: Optional[Dict[str, str]] = None) -> tuple[bool, bool, bool, float, int, float]:
         """
         检查逾期状态 - 两级SLA体系
 
         Args:
             use_business_time: 是否使用工作时间计算
+            sla_config: 预先读取的系统配置，批量计算时传入
 
         Returns:
             tuple: (是否需要提醒, 是否需要升级, 是否即将升级, 逾期时长, 升级级别, SLA进度比例)
@@ -435,8 +465,8 @@ class OpportunityInfo(BaseModel):
             elapsed = self.elapsed_hours
 
         # 获取两级阈值
-        reminder_threshold = self.get_sla_threshold("reminder")
-        escalation_threshold = self.get_sla_threshold("escalation")
+        reminder_threshold = self.get_sla_threshold("reminder", sla_config)
+        escalation_threshold = self.get_sla_threshold("escalation", sla_config)
 
         if escalation_threshold == 0:
             return False, False, False, 0, 0, 0.0
@@ -461,14 +491,16 @@ class OpportunityInfo(BaseModel):
 
         return is_reminder, is_escalation, is_approaching_escalation, overdue_hours, escalation_level, sla_progress
 
-    def update_overdue_info(self, use_business_time: bool = True):
+    def update_overdue_info(self, use_business_time: bool = True,
+                            sla_config: Optional[Dict[str, str]] = None):
         """
         更新逾期相关信息
 
         Args:
             use_business_time: 是否使用工作时间计算
+            sla_config: 预先读取的系统配置（见 load_sla_config），批量更新时传入以避免逐个查询数据库
         """
-        is_reminder, is_escalation, is_approaching_escalation, overdue_hours, escalation_level, sla_progress = self.check_overdue_status(use_business_time)
+        is_reminder, is_escalation, is_approaching_escalation, overdue_hours, escalation_level, sla_progress = self.check_overdue_status(use_business_time, sla_config)
 
         # 更新字段（保持向后兼容）
         self.is_violation = is_reminder      # 提醒状态映射到原来的违规字段
@@ -476,7 +508,7 @@ class OpportunityInfo(BaseModel):
         self.is_approaching_overdue = is_approaching_escalation
         self.overdue_hours = overdue_hours
         self.escalation_level = escalation_level
-        self.sla_threshold_hours = self.get_sla_threshold("escalation")  # 使用升级阈值作为主要阈值
+        self.sla_threshold_hours = self.get_sla_threshold("escalation", sla_config)  # 使用升级阈值作为主要阈值
         self.sla_progress_ratio = sla_progress
 
     def generate_source_hash(self) -> str:
@@ -6,6 +6,8 @@
 
 import requests
 import json
+import threading
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from requests.adapters import HTTPAdapter
@@ -33,6 +35,10 @@ class WeChatClient:
         self.internal_ops_webhook = self.config.internal_ops_webhook_url
         self.session = self._create_session()
 
+        # 每个Webhook一把锁：同一群串行发送以遵守速率限制，不同群可并发
+        self._webhook_locks: Dict[str, threading.Lock] = {}
+        self._webhook_locks_guard = threading.Lock()
+
         # API发送间隔配置（秒）
         self.api_interval_seconds = 3  # 默认3秒
         self._load_api_config()
@@ -229,6 +235,14 @@ class WeChatClient:
         
         return self._send_message(webhook_url, message_data)
     
+    def _get_webhook_lock(self, webhook_url: str) -> threading.Lock:
+        """获取指定Webhook的发送锁"""
+        with self._webhook_locks_guard:
+            lock = self._webhook_locks.get(webhook_url)
+            if lock is None:
+                lock = self._webhook_locks[webhook_url] = threading.Lock()
+            return lock
+
     def _send_message(self, webhook_url: str, message_data: Dict[str, Any]) -> bool:
         """
         发送消息到企微群 - 包含API速率限制控制
@@ -241,16 +255,16 @@ class WeChatClient:
             是否发送成功
         """
         try:
-            # API发送间隔控制 - 避免触发企微Webhook速率限制
-            import time
-            time.sleep(self.api_interval_seconds)
-            logger.debug(f"API interval sleep: {self.api_interval_seconds} seconds")
-
-            response = self.session.post(
-                webhook_url,
-                json=message_data,
-                timeout=10
-            )
+            # API发送间隔控制 - 避免触发企微Webhook速率限制（按Webhook串行）
+            with self._get_webhook_lock(webhook_url):
+                time.sleep(self.api_interval_seconds)
+                logger.debug(f"API interval sleep: {self.api_interval_seconds} seconds")
+
+                response = self.session.post(
+                    webhook_url,
+                    json=message_data,
+                    timeout=10
+                )
             response.raise_for_status()
 
             result = response.json()
@@ -522,7 +522,7 @@ def show_agent_control():
                     notification_result = {"sent_count": 0, "failed_count": 0}
                     if overdue_opportunities:
                         tasks = create_notification_tasks(overdue_opportunities, run_id)
-                        notification_result = execute_notification_tasks(run_id)
+                        notification_result = execute_notification_tasks(run_id, opportunities)
 
                     # 完成执行
                     final_stats = {
@@ -566,6 +566,8 @@ def show_agent_control():
                     data_strategy = get_data_strategy()
 
                     st.info("🧪 试运行完成！")
+                    if not stats.get("statistics_available", True):
+                        st.warning("暂无商机统计数据，请先执行Agent或刷新缓存")
 
                     # 显示模拟结果
                     col_a, col_b, col_c = st.columns(3)
@@ -1319,7 +1321,7 @@ def show_business_analytics():
             st.metric("涉及组织数", global_stats["organization_count"])
             st.caption("全部组织")
         with col5:
-            overdue_org_count = len(set(opp.org_name for opp in overdue_opportunities)) if overdue_opportunities else 0
+            overdue_org_count = len({opp.org_name for opp in overdue_opportunities}) if overdue_opportunities else 0
             st.metric("逾期涉及组织", overdue_org_count)
             st.caption("有逾期商机的组织")
 
@@ -5,7 +5,8 @@
 """
 
 import os
-from typing import List, Optional
+from functools import lru_cache
+from typing import Callable, List
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from dotenv import load_dotenv
@@ -52,7 +53,7 @@ class Config(BaseSettings):
     # 通知配置（技术配置）
     # 注意：大部分通知配置已迁移到数据库，通过Web UI管理
     max_retry_count: int = Field(5, env="MAX_RETRY_COUNT")  # 降级方案的最大重试次数
-    
+
     # 开发配置
     debug: bool = Field(False, env="DEBUG")
     testing: bool = Field(False, env="TESTING")
@@ -106,21 +107,25 @@ class Config(BaseSettings):
         env_file_encoding = "utf-8"
 
 
-# 全局配置实例
-_config: Optional[Config] = None
-
-
+# 全局配置实例 - lru_cache(maxsize=1) 缓存，reload_config 时清除
+@lru_cache(maxsize=1)
 def get_config() -> Config:
     """获取配置实例"""
-    global _config
-    if _config is None:
-        _config = Config()
-    return _config
+    return Config()
+
+
+# 配置重新加载后需要清除的缓存 - 由基于配置创建实例的模块自行注册
+_reload_callbacks: List[Callable[[], None]] = []
+
+
+def register_reload_callback(callback: Callable[[], None]) -> Callable[[], None]:
+    """注册配置重新加载后执行的回调，用于清除基于旧配置创建的缓存"""
+    _reload_callbacks.append(callback)
+    return callback
 
 
 def reload_config():
     """重新加载配置"""
-    global _config
     # 清除环境变量缓存
     import os
     for key in list(os.environ.keys()):
@@ -129,4 +134,8 @@ def reload_config():
 
     # 重新加载 .env 文件
     load_dotenv(override=True)
-    _config = None  # 强制重新创建配置实例
+    get_config.cache_clear()  # 强制重新创建配置实例
+
+    # 清除各模块基于旧配置创建的缓存（如Metabase客户端、健康检查探测结果）
+    for callback in _reload_callbacks:
+        callback()
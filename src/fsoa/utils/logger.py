@@ -9,6 +9,7 @@ import sys
 import logging
 import structlog
 from datetime import datetime
+from functools import wraps
 from typing import Any, Dict
 from pathlib import Path
 
@@ -72,9 +73,19 @@ class LoggerMixin:
 
 
 def log_function_call(func):
-    """函数调用日志装饰器"""
+    """函数调用日志装饰器 - INFO级别未启用时直接调用，省去计时与日志参数构造"""
+    logger = get_logger(func.__module__)
+    level_logger = logging.getLogger(func.__module__)
+
+    @wraps(func)
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__)
+        if not level_logger.isEnabledFor(logging.INFO):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                logger.error("Function failed", function=func.__name__, error=str(e))
+                raise
+
         logger.info(
             "Function called",
             function=func.__name__,
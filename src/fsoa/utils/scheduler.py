@@ -143,7 +143,8 @@ class TaskScheduler:
                 "name": job.name,
                 "func": job.func.__name__,
                 "trigger": str(job.trigger),
-                "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None
+                "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None,
+                "next_run_at": job.next_run_time  # 带时区的datetime，供状态查询直接使用，免去字符串解析
             })
 
         # 检测调度器的实际运行状态
@@ -37,6 +37,15 @@ from src.fsoa.data.database import DatabaseManager
 from src.fsoa.utils.config import Config
 
 
+@pytest.fixture(autouse=True)
+def clear_health_probe_cache():
+    """清空健康检查探测缓存，避免测试之间相互影响"""
+    from src.fsoa.agent import tools
+    tools.reset_health_probe_cache()
+    yield
+    tools.reset_health_probe_cache()
+
+
 @pytest.fixture(scope="session")
 def test_database():
     """创建测试数据库"""
@@ -45,6 +45,8 @@ class TestCompleteWorkflow:
         mock.get_all_opportunity_cache.return_value = []
         mock.get_pending_notification_tasks.return_value = []
         mock.save_notification_task.return_value = 1
+        mock.save_notification_tasks.side_effect = lambda tasks: list(range(1, len(tasks) + 1))
+        mock.claim_notification_tasks.side_effect = lambda task_ids, run_id: list(task_ids)
         mock.save_agent_run.return_value = 1
         mock.update_agent_run.return_value = True
         mock.get_agent_run.return_value = None
@@ -3,13 +3,14 @@ Agent模块测试
 """
 
 import pytest
-from unittest.mock import patch, Mock, MagicMock
+from contextlib import nullcontext
+from unittest.mock import patch, Mock, MagicMock, ANY
 from datetime import datetime
 
 from src.fsoa.agent.orchestrator import AgentOrchestrator, AgentState
 from src.fsoa.agent.decision import DecisionEngine, RuleEngine, DecisionMode
 from src.fsoa.agent.llm import DeepSeekClient
-from src.fsoa.data.models import OpportunityInfo, OpportunityStatus, Priority, DecisionResult
+from src.fsoa.data.models import OpportunityInfo, OpportunityStatus, Priority, DecisionResult, AgentStatus
 
 
 class TestRuleEngine:
@@ -296,3 +297,92 @@ class TestAgentOrchestrator:
         assert hasattr(result, 'errors')
         if hasattr(result, 'errors') and result.errors:
             assert len(result.errors) > 0
+
+    def test_aexecute_delegates_to_execute(self):
+        """测试异步执行委托给同步执行"""
+        import asyncio
+
+        orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
+        expected = Mock()
+        orchestrator.execute = Mock(return_value=expected)
+
+        result = asyncio.run(orchestrator.aexecute(dry_run=True))
+
+        assert result is expected
+        orchestrator.execute.assert_called_once_with(dry_run=True, force_refresh=False)
+
+    def test_summarize_opportunities_single_pass(self, multiple_opportunities):
+        """测试商机汇总统计"""
+        from src.fsoa.agent.orchestrator import _summarize_opportunities
+
+        multiple_opportunities[0].is_overdue = True
+        multiple_opportunities[2].is_overdue = True
+        multiple_opportunities[2].escalation_level = 1
+
+        summary = _summarize_opportunities(multiple_opportunities)
+
+        assert summary["total_opportunities"] == 3
+        assert summary["overdue_count"] == 2
+        assert summary["escalation_count"] == 1
+        assert summary["organization_stats"]["测试公司C"] == {"total": 1, "overdue": 1, "escalation": 1}
+
+    def test_compiled_graph_shared_between_instances(self):
+        """测试执行图在编排器实例间共享，只编译一次"""
+        first = AgentOrchestrator.__new__(AgentOrchestrator)
+        second = AgentOrchestrator.__new__(AgentOrchestrator)
+
+        assert first.graph is second.graph
+
+    def test_execute_reports_progress_per_node(self):
+        """测试执行过程中逐节点回调进度"""
+        orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
+        orchestrator.execution_tracker = MagicMock()
+        orchestrator.execution_tracker.start_run.return_value = 1
+        orchestrator.data_strategy = Mock()
+        orchestrator.data_strategy.get_overdue_opportunities.return_value = []
+        progress = []
+
+        result = orchestrator.execute(
+            dry_run=True,
+            progress_callback=lambda node_name, state: progress.append(node_name)
+        )
+
+        assert progress == ["fetch_data", "analyze_status", "record_results"]
+        assert result.status == AgentStatus.IDLE
+
+    def test_node_failure_recorded_with_traceback(self, sample_opportunity):
+        """测试节点异常写入状态与步骤输出，并记录带堆栈的日志"""
+        orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
+        output = {}
+        orchestrator.execution_tracker = Mock()
+        orchestrator.execution_tracker.track_step.return_value = nullcontext(output)
+        orchestrator.notification_manager = Mock()
+        orchestrator.notification_manager.create_notification_tasks.side_effect = RuntimeError("database is locked")
+        state = AgentState(execution_id="exec", run_id=1, start_time=datetime.now(),
+                           opportunities=[sample_opportunity])
+
+        with patch('src.fsoa.agent.orchestrator.logger') as mock_logger:
+            result = orchestrator._make_decision_node(state)
+
+        assert result.errors == ["Failed to make decision: database is locked"]
+        assert output["error"] == "Failed to make decision: database is locked"
+        orchestrator.execution_tracker.track_step.assert_called_once_with("make_decision", {"run_id": 1})
+        mock_logger.exception.assert_called_once_with("Failed to %s: %s", "make decision", ANY)
+
+    def test_fetch_failure_falls_back_to_cache(self, sample_opportunity):
+        """测试获取商机失败时记录错误并降级使用缓存商机"""
+        orchestrator = AgentOrchestrator.__new__(AgentOrchestrator)
+        output = {}
+        orchestrator.execution_tracker = Mock()
+        orchestrator.execution_tracker.track_step.return_value = nullcontext(output)
+        orchestrator.data_strategy = Mock()
+        orchestrator.data_strategy.get_overdue_opportunities.side_effect = RuntimeError("metabase down")
+        orchestrator.data_strategy.get_cached_opportunities.return_value = [sample_opportunity]
+        state = AgentState(execution_id="exec", run_id=1, start_time=datetime.now())
+
+        result = orchestrator._fetch_data_node(state)
+
+        assert result.errors == ["Failed to fetch opportunities: metabase down"]
+        assert result.opportunities == [sample_opportunity]
+        assert result.context["use_cached_data"] is True
+        assert output["fallback_to_cache"] is True
@@ -180,6 +180,76 @@ class TestBusinessDataStrategy:
             assert isinstance(stats, dict)  # 基础检查，因为Mock对象导致统计失败
             # 由于Mock对象问题，暂时只检查基本结构
     
+    def test_statistics_snapshot_written_with_fresh_data(self, data_strategy):
+        """测试拉取最新数据时同步生成统计快照"""
+        assert data_strategy.get_statistics_snapshot() is None
+
+        data_strategy.get_opportunities()
+        snapshot = data_strategy.get_statistics_snapshot()
+
+        assert snapshot["total_opportunities"] == 1
+        assert snapshot["overdue_opportunities"] == 1
+        assert snapshot["organizations"] == 1
+
+        # 返回副本，调用方修改不影响快照
+        snapshot["total_opportunities"] = 99
+        assert data_strategy.get_statistics_snapshot()["total_opportunities"] == 1
+
+    def test_statistics_snapshot_built_from_cache(self, data_strategy, mock_db_manager, mock_metabase_client,
+                                                  multiple_opportunities):
+        """测试基于本地缓存生成统计，不请求Metabase；缓存更新后重新生成"""
+        mock_db_manager.get_cached_opportunities.return_value = multiple_opportunities
+
+        with patch.object(data_strategy, '_get_cache_last_updated',
+                          return_value=datetime.now() - timedelta(days=1)):
+            snapshot = data_strategy.get_statistics_snapshot(build_from_cache=True)
+            assert snapshot["total_opportunities"] == len(multiple_opportunities)
+
+            # 缓存未更新时复用已有快照
+            mock_db_manager.get_cached_opportunities.return_value = multiple_opportunities[:1]
+            assert data_strategy.get_statistics_snapshot(build_from_cache=True)["total_opportunities"] == \
+                len(multiple_opportunities)
+
+        # 其他进程刷新缓存后（缓存写入时间晚于快照），超过检查间隔时重新生成
+        data_strategy._cache_checked_at = None
+        with patch.object(data_strategy, '_get_cache_last_updated',
+                          return_value=snapshot["snapshot_time"] + timedelta(minutes=1)):
+            assert data_strategy.get_statistics_snapshot(build_from_cache=True)["total_opportunities"] == 1
+
+        mock_metabase_client.get_all_monitored_opportunities.assert_not_called()
+
+    def test_statistics_snapshot_not_built_when_cache_disabled(self, data_strategy, mock_db_manager):
+        """测试缓存未启用时不基于缓存生成快照"""
+        data_strategy.enable_cache = False
+
+        with patch.object(data_strategy, '_get_cache_last_updated') as mock_last_updated:
+            assert data_strategy.get_statistics_snapshot(build_from_cache=True) is None
+
+        mock_last_updated.assert_not_called()
+        mock_db_manager.get_cached_opportunities.assert_not_called()
+
+    def test_cache_freshness_checked_once_per_interval(self, data_strategy, mock_db_manager,
+                                                         multiple_opportunities):
+        """测试检查间隔内重复的统计查询复用缓存写入时间，不重复执行聚合查询"""
+        mock_db_manager.get_cached_opportunities.return_value = multiple_opportunities
+        last_updated = datetime.now() - timedelta(days=1)
+
+        with patch.object(data_strategy, '_get_cache_last_updated', return_value=last_updated) as mock_last_updated, \
+             patch('src.fsoa.agent.managers.data_strategy.time.monotonic', side_effect=[100.0, 110.0, 140.0]):
+            for _ in range(3):
+                snapshot = data_strategy.get_statistics_snapshot(build_from_cache=True)
+
+        assert snapshot["total_opportunities"] == len(multiple_opportunities)
+        assert mock_last_updated.call_count == 2
+        mock_db_manager.get_cached_opportunities.assert_called_once()
+
+    def test_statistics_snapshot_not_built_from_empty_cache(self, data_strategy, mock_db_manager):
+        """测试本地缓存为空时不生成全零快照"""
+        with patch.object(data_strategy, '_get_cache_last_updated', return_value=None):
+            assert data_strategy.get_statistics_snapshot(build_from_cache=True) is None
+
+        mock_db_manager.get_cached_opportunities.assert_not_called()
+
     def test_error_handling_metabase_failure(self, data_strategy, mock_metabase_client):
         """测试Metabase连接失败的错误处理"""
         # Arrange
@@ -228,6 +228,50 @@ class TestAgentExecutionTracker:
         # Assert
         mock_db_manager.save_agent_history.assert_called_once()
 
+    def test_buffered_steps_flush_once(self, execution_tracker, mock_db_manager):
+        """测试缓冲模式下步骤记录在退出时批量写入"""
+        # Arrange
+        execution_tracker.current_run_id = 1
+        mock_db_manager.save_agent_histories.return_value = True
+
+        # Act
+        with execution_tracker.buffered_steps(1):
+            for step_name in ("fetch_data", "analyze_status", "record_results"):
+                with execution_tracker.track_step(step_name, {"run_id": 1}):
+                    pass
+            mock_db_manager.save_agent_histories.assert_not_called()
+
+        # Assert
+        mock_db_manager.save_agent_history.assert_not_called()
+        mock_db_manager.save_agent_histories.assert_called_once()
+        histories = mock_db_manager.save_agent_histories.call_args[0][0]
+        assert [history.step_name for history in histories] == ["fetch_data", "analyze_status", "record_results"]
+
+    def test_buffered_steps_isolated_per_run(self, execution_tracker, mock_db_manager):
+        """测试并发运行交错记录步骤时，各自缓冲互不覆盖且每条记录只写入一次"""
+        mock_db_manager.save_agent_histories.return_value = True
+        run_a = execution_tracker.buffered_steps(1)
+        run_b = execution_tracker.buffered_steps(2)
+
+        run_a.__enter__()
+        execution_tracker.log_step(1, "a_fetch")
+        run_b.__enter__()
+        execution_tracker.log_step(2, "b_fetch")
+        execution_tracker.log_step(1, "a_notify")
+        run_b.__exit__(None, None, None)
+        execution_tracker.log_step(1, "a_record")
+        run_a.__exit__(None, None, None)
+
+        mock_db_manager.save_agent_history.assert_not_called()
+        flushed = [
+            [(history.run_id, history.step_name) for history in call.args[0]]
+            for call in mock_db_manager.save_agent_histories.call_args_list
+        ]
+        assert flushed == [
+            [(2, "b_fetch")],
+            [(1, "a_fetch"), (1, "a_notify"), (1, "a_record")]
+        ]
+
     def test_update_run_progress(self, execution_tracker, mock_db_manager):
         """测试更新运行进度"""
         # Arrange
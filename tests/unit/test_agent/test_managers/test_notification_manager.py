@@ -26,8 +26,16 @@ class TestNotificationTaskManager:
             "max_retry_count": "5"
         }
         mock_db.save_notification_task.return_value = True
+        mock_db.save_notification_tasks.side_effect = lambda tasks: list(range(1, len(tasks) + 1))
+        mock_db.claim_notification_tasks.side_effect = lambda task_ids, run_id: list(task_ids)
         mock_db.update_notification_task.return_value = True
         mock_db.get_pending_notification_tasks.return_value = []
+        mock_db.get_active_notification_keys.return_value = set()
+        mock_db.get_recent_notification_keys.return_value = set()
+        mock_db.has_active_escalation_task.return_value = False
+        mock_db.reclaim_expired_notification_claims.return_value = 0
+        mock_db.get_cached_opportunities.return_value = []
+        mock_db.get_opportunity_cache.return_value = None
         return mock_db
     
     @pytest.fixture
@@ -38,11 +46,19 @@ class TestNotificationTaskManager:
         return mock_client
     
     @pytest.fixture
-    def notification_manager(self, mock_db_manager, mock_wechat_client):
+    def mock_data_strategy(self):
+        """Mock业务数据策略"""
+        mock_strategy = Mock()
+        mock_strategy.cache_enabled = True
+        mock_strategy.get_opportunities.return_value = []
+        return mock_strategy
+
+    @pytest.fixture
+    def notification_manager(self, mock_db_manager, mock_wechat_client, mock_data_strategy):
         """创建通知管理器实例"""
         with patch('src.fsoa.agent.managers.notification_manager.get_db_manager', return_value=mock_db_manager), \
              patch('src.fsoa.notification.wechat.get_wechat_client', return_value=mock_wechat_client):
-            return NotificationTaskManager()
+            return NotificationTaskManager(mock_data_strategy)
     
     def test_initialization(self, notification_manager):
         """测试初始化"""
@@ -99,6 +115,33 @@ class TestNotificationTaskManager:
         assert isinstance(tasks, list)
         # 升级通知需要特殊的配置才会创建，这里主要测试方法不报错
     
+    def test_create_notification_tasks_queries_pending_once(self, notification_manager, multiple_opportunities,
+                                                            mock_db_manager):
+        """测试批量创建时待处理任务与冷却期通知只查询一次并据此去重"""
+        # Arrange
+        mock_db_manager.get_active_notification_keys.return_value = {
+            ("GD20250001", NotificationTaskType.REMINDER)
+        }
+        mock_db_manager.get_recent_notification_keys.return_value = {
+            ("GD20250002", NotificationTaskType.REMINDER)
+        }
+        notification_manager.reminder_enabled = True
+        notification_manager.escalation_enabled = False
+
+        def mark_violation(self, use_business_time=True, sla_config=None):
+            self.is_violation = True
+            self.escalation_level = 0
+
+        # Act
+        with patch.object(OpportunityInfo, 'update_overdue_info', mark_violation):
+            tasks = notification_manager.create_notification_tasks(multiple_opportunities, 1)
+
+        # Assert
+        assert [task.order_num for task in tasks] == ["GD20250003"]
+        mock_db_manager.get_active_notification_keys.assert_called_once()
+        mock_db_manager.get_recent_notification_keys.assert_called_once()
+        mock_db_manager.get_recent_notification_tasks.assert_not_called()
+
     def test_execute_notification_tasks(self, notification_manager, sample_notification_task, mock_db_manager):
         """测试执行通知任务"""
         # Arrange
@@ -194,10 +237,250 @@ class TestNotificationTaskManager:
             due_time=datetime.now(),
             status=NotificationTaskStatus.PENDING
         )
-        mock_db_manager.get_pending_notification_tasks.return_value = [existing_task]
+        mock_db_manager.get_active_notification_keys.return_value = {
+            (existing_task.order_num, existing_task.notification_type)
+        }
 
         # Act - 尝试创建重复的通知任务
         tasks = notification_manager.create_notification_tasks([sample_opportunity], 1)
 
         # Assert - 应该不会创建重复任务
-        assert len(tasks) == 0  # 因为已存在相同的待处理任务
\ No newline at end of file
+        assert len(tasks) == 0  # 因为已存在相同的待处理任务
+
+    def test_execute_pending_tasks_dispatches_orgs_concurrently(self, notification_manager, mock_db_manager):
+        """测试多组织并发发送并汇总结果"""
+        # Arrange
+        tasks = [
+            NotificationTask(
+                order_num=f"GD2025000{i}",
+                org_name=org_name,
+                notification_type=NotificationTaskType.REMINDER,
+                due_time=datetime.now() - timedelta(minutes=5)
+            )
+            for i, org_name in enumerate(["测试公司A", "测试公司B", "测试公司C"])
+        ]
+        mock_db_manager.get_pending_notification_tasks.return_value = tasks
+        notification_manager.max_concurrent_sends = 3
+
+        def send_org(org_name, org_tasks, run_id, opportunities=None):
+            if org_name == "测试公司C":
+                raise RuntimeError("webhook down")
+            return NotificationResult(sent_count=len(org_tasks))
+
+        # Act
+        with patch.object(notification_manager, '_send_org_notifications', side_effect=send_org):
+            result = notification_manager.execute_pending_tasks(1)
+
+        # Assert
+        assert result.total_tasks == 3
+        assert result.sent_count == 2
+        assert result.failed_count == 1
+        assert any("测试公司C" in error for error in result.errors)
+
+    def test_dispatch_splits_escalation_and_reminder_batches(self, notification_manager):
+        """测试同组织的升级与提醒通知拆分为独立批次"""
+        # Arrange
+        tasks = [
+            NotificationTask(
+                order_num=f"GD2025000{i}",
+                org_name="测试公司A",
+                notification_type=notification_type,
+                due_time=datetime.now() - timedelta(minutes=5)
+            )
+            for i, notification_type in enumerate([
+                NotificationTaskType.REMINDER, NotificationTaskType.ESCALATION, NotificationTaskType.REMINDER
+            ])
+        ]
+        notification_manager.max_concurrent_sends = 2
+        sent_batches = []
+
+        def send_org(org_name, org_tasks, run_id, opportunities=None):
+            sent_batches.append([task.notification_type for task in org_tasks])
+            return NotificationResult(sent_count=len(org_tasks))
+
+        # Act
+        with patch.object(notification_manager, '_send_org_notifications', side_effect=send_org):
+            results = notification_manager._dispatch_org_notifications({"测试公司A": tasks}, 1)
+
+        # Assert
+        assert [org_name for org_name, _, _ in results] == ["测试公司A", "测试公司A"]
+        assert sorted(sent_batches, key=len) == [
+            [NotificationTaskType.ESCALATION],
+            [NotificationTaskType.REMINDER, NotificationTaskType.REMINDER]
+        ]
+
+    def test_successful_batch_updates_status_once(self, notification_manager, mock_db_manager):
+        """测试同批次发送成功后任务消息与状态各只写入一次"""
+        # Arrange
+        tasks = [
+            NotificationTask(
+                id=i,
+                order_num=f"GD2025000{i}",
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.REMINDER,
+                due_time=datetime.now()
+            )
+            for i in (1, 2, 3)
+        ]
+
+        # Act
+        with patch.object(notification_manager, '_format_notification_message', return_value="提醒消息"), \
+             patch.object(notification_manager.wechat_client, 'send_notification_to_org', return_value=True):
+            result = notification_manager._send_org_notifications("测试公司A", tasks, 7)
+
+        # Assert
+        assert result.sent_count == 3
+        mock_db_manager.update_notification_tasks_message.assert_called_once_with([1, 2, 3], "提醒消息")
+        mock_db_manager.update_notification_tasks_status.assert_called_once_with(
+            [1, 2, 3], NotificationTaskStatus.SENT, 7
+        )
+        mock_db_manager.update_notification_task_status.assert_not_called()
+
+    def test_claim_failure_recorded_as_error(self, notification_manager, mock_db_manager):
+        """测试认领任务时数据库异常计入错误，而不是当作已被其他运行认领"""
+        # Arrange
+        mock_db_manager.get_pending_notification_tasks.return_value = [
+            NotificationTask(
+                id=1,
+                order_num="GD20250001",
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.REMINDER,
+                due_time=datetime.now() - timedelta(minutes=5)
+            )
+        ]
+        mock_db_manager.claim_notification_tasks.side_effect = RuntimeError("database is locked")
+
+        # Act
+        with patch.object(notification_manager, '_send_org_notifications') as mock_send:
+            result = notification_manager.execute_pending_tasks(1)
+
+        # Assert
+        mock_send.assert_not_called()
+        assert result.errors == ["Failed to claim notification tasks: database is locked"]
+
+    def test_execute_reclaims_expired_claims_before_pending_query(self, notification_manager, mock_db_manager):
+        """测试无待处理任务时也会先回收租约过期的发送中任务"""
+        # Arrange
+        calls = []
+        mock_db_manager.reclaim_expired_notification_claims.side_effect = lambda: calls.append("reclaim") or 1
+        mock_db_manager.get_pending_notification_tasks.side_effect = lambda: calls.append("pending") or []
+
+        # Act
+        result = notification_manager.execute_pending_tasks(1)
+
+        # Assert
+        assert calls == ["reclaim", "pending"]
+        assert result.total_tasks == 0
+
+    def test_escalation_sends_share_cached_opportunities(self, notification_manager, mock_db_manager,
+                                                         mock_data_strategy):
+        """测试并发发送升级通知时只在发送前读取一次本地缓存商机，不逐个查询也不重新拉取"""
+        # Arrange
+        opportunities = [
+            OpportunityInfo(
+                order_num=f"GD2025000{i}",
+                name="张三",
+                address="北京市朝阳区建国路1号",
+                supervisor_name="李销售",
+                create_time=datetime.now() - timedelta(days=10),
+                org_name=org_name,
+                order_status=OpportunityStatus.PENDING_APPOINTMENT
+            )
+            for i, org_name in enumerate(["测试公司A", "测试公司B"])
+        ]
+        mock_db_manager.get_cached_opportunities.return_value = opportunities
+        mock_db_manager.get_pending_notification_tasks.return_value = [
+            NotificationTask(
+                id=i,
+                order_num=opp.order_num,
+                org_name=opp.org_name,
+                notification_type=NotificationTaskType.ESCALATION,
+                due_time=datetime.now() - timedelta(minutes=5)
+            )
+            for i, opp in enumerate(opportunities, 1)
+        ]
+        notification_manager.max_concurrent_sends = 2
+
+        # Act
+        with patch.object(notification_manager.wechat_client, 'send_notification_to_org',
+                          return_value=True) as mock_send:
+            result = notification_manager.execute_pending_tasks(1)
+
+        # Assert
+        assert result.escalated_count == 2
+        assert mock_send.call_count == 2
+        mock_db_manager.get_cached_opportunities.assert_called_once_with(24 * 7)
+        mock_db_manager.get_opportunity_cache.assert_not_called()
+        mock_data_strategy.get_opportunities.assert_not_called()
+
+    def test_escalation_sends_fetch_once_when_cache_disabled(self, notification_manager, mock_db_manager,
+                                                             mock_data_strategy):
+        """测试缓存未启用时优先使用本次运行的商机，缺失的统一拉取一次，升级通知实际发送"""
+        # Arrange
+        opportunities = [
+            OpportunityInfo(
+                order_num=f"GD2025000{i}",
+                name="张三",
+                address="北京市朝阳区建国路1号",
+                supervisor_name="李销售",
+                create_time=datetime.now() - timedelta(days=10),
+                org_name=org_name,
+                order_status=OpportunityStatus.PENDING_APPOINTMENT
+            )
+            for i, org_name in enumerate(["测试公司A", "测试公司B"])
+        ]
+        mock_data_strategy.cache_enabled = False
+        mock_data_strategy.get_opportunities.return_value = opportunities[1:]
+        mock_db_manager.get_pending_notification_tasks.return_value = [
+            NotificationTask(
+                id=i,
+                order_num=opp.order_num,
+                org_name=opp.org_name,
+                notification_type=NotificationTaskType.ESCALATION,
+                due_time=datetime.now() - timedelta(minutes=5)
+            )
+            for i, opp in enumerate(opportunities, 1)
+        ]
+
+        # Act
+        with patch.object(notification_manager.wechat_client, 'send_notification_to_org',
+                          return_value=True) as mock_send:
+            result = notification_manager.execute_pending_tasks(1, opportunities[:1])
+
+        # Assert
+        assert result.escalated_count == 2
+        assert sorted(call.kwargs["org_name"] for call in mock_send.call_args_list) == ["测试公司A", "测试公司B"]
+        assert all("GD2025000" in call.kwargs["content"] for call in mock_send.call_args_list)
+        mock_data_strategy.get_opportunities.assert_called_once_with()
+        mock_db_manager.get_cached_opportunities.assert_not_called()
+
+    def test_escalation_send_does_not_mutate_shared_opportunities(self, notification_manager):
+        """测试升级发送复制共享商机后再重新计算状态，并发批次间的数据保持只读"""
+        # Arrange
+        shared = OpportunityInfo(
+            order_num="GD20250001",
+            name="张三",
+            address="北京市朝阳区建国路1号",
+            supervisor_name="李销售",
+            create_time=datetime.now() - timedelta(days=10),
+            org_name="测试公司A",
+            order_status=OpportunityStatus.PENDING_APPOINTMENT
+        )
+        task = NotificationTask(
+            id=1,
+            order_num=shared.order_num,
+            org_name=shared.org_name,
+            notification_type=NotificationTaskType.ESCALATION,
+            due_time=datetime.now()
+        )
+
+        # Act
+        with patch.object(notification_manager.wechat_client, 'send_notification_to_org', return_value=True):
+            success = notification_manager._send_escalation_notification(
+                "测试公司A", [task], 1, {shared.order_num: shared}
+            )
+
+        # Assert
+        assert success is True
+        assert shared.escalation_level == 0
+        assert shared.is_overdue is None
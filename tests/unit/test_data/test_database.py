@@ -21,3 +21,203 @@ class TestDatabase:
         """测试模块基本功能"""
         # 这里添加具体的测试逻辑
         assert True
+
+
+class TestNotificationTaskPersistence:
+    """测试通知任务持久化"""
+
+    @pytest.fixture
+    def db_manager(self, test_database):
+        from src.fsoa.data.database import DatabaseManager, NotificationTaskTable
+
+        manager = DatabaseManager(f"sqlite:///{test_database}")
+        yield manager
+        with manager.get_session() as session:
+            session.query(NotificationTaskTable).delete()
+            session.commit()
+
+    def test_save_notification_tasks_returns_ids_in_order(self, db_manager):
+        """批量保存返回与输入顺序一致的ID"""
+        from datetime import datetime
+        from src.fsoa.data.models import NotificationTask, NotificationTaskType
+
+        tasks = [
+            NotificationTask(
+                order_num=f"GD2025000{i}",
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.REMINDER,
+                due_time=datetime.now()
+            )
+            for i in range(3)
+        ]
+
+        task_ids = db_manager.save_notification_tasks(tasks)
+
+        assert len(task_ids) == 3
+        assert len(set(task_ids)) == 3
+        pending = {task.id: task.order_num for task in db_manager.get_pending_notification_tasks()}
+        assert [pending[task_id] for task_id in task_ids] == [task.order_num for task in tasks]
+
+    def test_save_notification_tasks_empty(self, db_manager):
+        """空列表不访问数据库"""
+        assert db_manager.save_notification_tasks([]) == []
+
+    def test_init_database_creates_notification_task_index(self, db_manager):
+        """已存在的表也会补建 status+created_at 索引"""
+        from sqlalchemy import inspect
+
+        db_manager.init_database()
+
+        index_names = {index["name"] for index in inspect(db_manager.engine).get_indexes("notification_tasks")}
+        assert "idx_notification_tasks_status_created" in index_names
+
+    def test_claim_notification_tasks_is_exclusive(self, db_manager):
+        """同一任务只能被一次运行认领，释放后回退为待处理"""
+        from datetime import datetime
+        from src.fsoa.data.models import NotificationTask, NotificationTaskType
+
+        task_ids = db_manager.save_notification_tasks([
+            NotificationTask(
+                order_num=f"GD2025010{i}",
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.REMINDER,
+                due_time=datetime.now()
+            )
+            for i in range(2)
+        ])
+
+        assert sorted(db_manager.claim_notification_tasks(task_ids, run_id=1)) == sorted(task_ids)
+        assert db_manager.claim_notification_tasks(task_ids, run_id=2) == []
+        assert db_manager.get_pending_notification_tasks() == []
+
+        assert db_manager.release_notification_tasks(run_id=1) == 2
+        released = db_manager.get_pending_notification_tasks()
+        assert len(released) == 2
+        assert all(task.sent_run_id is None for task in released)
+
+    def test_active_notification_keys_include_sending(self, db_manager):
+        """发送中（已被认领）的任务仍计入进行中任务，避免并发运行重复创建"""
+        from datetime import datetime
+        from src.fsoa.data.models import NotificationTask, NotificationTaskType
+
+        claimed_id, _ = db_manager.save_notification_tasks([
+            NotificationTask(
+                order_num=order_num,
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.ESCALATION,
+                due_time=datetime.now()
+            )
+            for order_num in ("GD20250201", "GD20250202")
+        ])
+        db_manager.claim_notification_tasks([claimed_id], run_id=1)
+
+        assert db_manager.get_active_notification_keys() == {
+            ("GD20250201", NotificationTaskType.ESCALATION),
+            ("GD20250202", NotificationTaskType.ESCALATION)
+        }
+        assert db_manager.has_active_escalation_task("测试公司A") is True
+        assert db_manager.has_active_escalation_task("测试公司B") is False
+
+    def test_expired_claim_reclaimed_without_pending_tasks(self, db_manager):
+        """运行异常退出遗留的发送中任务，租约过期后不再阻塞去重并可被回收"""
+        from datetime import datetime, timedelta
+        from src.fsoa.data.database import NotificationTaskTable
+        from src.fsoa.data.models import NotificationTask, NotificationTaskType
+
+        task_id, = db_manager.save_notification_tasks([
+            NotificationTask(
+                order_num="GD20250401",
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.ESCALATION,
+                due_time=datetime.now()
+            )
+        ])
+        db_manager.claim_notification_tasks([task_id], run_id=1)
+        with db_manager.get_session() as session:
+            session.query(NotificationTaskTable).filter_by(id=task_id).update(
+                {"updated_at": datetime.now() - timedelta(days=2)}
+            )
+            session.commit()
+
+        # 没有待处理任务，仅有一条卡住的发送中任务
+        assert db_manager.get_pending_notification_tasks() == []
+        assert db_manager.get_active_notification_keys() == set()
+        assert db_manager.has_active_escalation_task("测试公司A") is False
+
+        assert db_manager.reclaim_expired_notification_claims() == 1
+        reclaimed = db_manager.get_pending_notification_tasks()
+        assert [(task.id, task.sent_run_id) for task in reclaimed] == [(task_id, None)]
+
+    def test_get_recent_notification_keys(self, db_manager):
+        """冷却期检查一次查询返回已发送通知的 (工单号, 类型) 集合"""
+        from datetime import datetime, timedelta
+        from src.fsoa.data.models import NotificationTask, NotificationTaskType, NotificationTaskStatus
+
+        sent_id, _ = db_manager.save_notification_tasks([
+            NotificationTask(
+                order_num=order_num,
+                org_name="测试公司A",
+                notification_type=NotificationTaskType.REMINDER,
+                due_time=datetime.now()
+            )
+            for order_num in ("GD20250101", "GD20250102")
+        ])
+        db_manager.update_notification_task_status(sent_id, NotificationTaskStatus.SENT, sent_run_id=1)
+
+        since = datetime.now() - timedelta(hours=24)
+        assert db_manager.get_recent_notification_keys(since) == {
+            ("GD20250101", NotificationTaskType.REMINDER)
+        }
+
+    def test_get_recent_notification_keys_skips_unknown_types(self, db_manager):
+        """旧数据中无法识别的通知类型不影响其他工单的冷却期检查"""
+        from datetime import datetime, timedelta
+        from src.fsoa.data.database import NotificationTaskTable
+        from src.fsoa.data.models import NotificationTaskType
+
+        now = datetime.now()
+        with db_manager.get_session() as session:
+            session.add_all([
+                NotificationTaskTable(
+                    order_num=order_num, org_name="测试公司A", notification_type=notification_type,
+                    due_time=now, status="sent", sent_at=now, created_at=now
+                )
+                for order_num, notification_type in (("GD20250301", "standard"), ("GD20250302", "reminder"))
+            ])
+            session.commit()
+
+        assert db_manager.get_recent_notification_keys(now - timedelta(hours=1)) == {
+            ("GD20250302", NotificationTaskType.REMINDER)
+        }
+
+
+class TestAgentRunPersistence:
+    """测试Agent执行记录持久化"""
+
+    @pytest.fixture
+    def db_manager(self, test_database):
+        from src.fsoa.data.database import DatabaseManager, AgentRunTable
+
+        manager = DatabaseManager(f"sqlite:///{test_database}")
+        yield manager
+        with manager.get_session() as session:
+            session.query(AgentRunTable).delete()
+            session.commit()
+
+    def test_get_agent_run_by_id(self, db_manager):
+        """按主键获取单条执行记录"""
+        from datetime import datetime
+        from src.fsoa.data.models import AgentRun, AgentRunStatus
+
+        run_id = db_manager.save_agent_run(AgentRun(
+            trigger_time=datetime.now(),
+            status=AgentRunStatus.RUNNING,
+            context={"trigger": "manual"}
+        ))
+
+        run = db_manager.get_agent_run(run_id)
+
+        assert run.id == run_id
+        assert run.status == AgentRunStatus.RUNNING
+        assert run.context == {"trigger": "manual"}
+        assert db_manager.get_agent_run(run_id + 1000) is None
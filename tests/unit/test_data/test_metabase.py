@@ -21,3 +21,66 @@ class TestMetabase:
         """测试模块基本功能"""
         # 这里添加具体的测试逻辑
         assert True
+
+    def test_query_reauthenticates_on_expired_session(self):
+        """测试共享客户端会话令牌过期时重新认证并重试"""
+        from src.fsoa.data.metabase import MetabaseClient
+
+        client = MetabaseClient("https://metabase.example.com", "user", "pass")
+        client.session_token = "expired"
+
+        expired = Mock(status_code=401)
+        ok = Mock(status_code=200)
+        ok.json.return_value = {"data": {"cols": [{"name": "test"}], "rows": [[1]]}}
+
+        with patch.object(client.session, 'post', side_effect=[expired, ok]) as mock_post, \
+             patch.object(client, 'authenticate', return_value=True) as mock_auth:
+            result = client.query_database("SELECT 1 as test")
+
+        assert result == [{"test": 1}]
+        mock_auth.assert_called_once()
+        assert mock_post.call_count == 2
+
+    def test_concurrent_expired_session_authenticates_once(self):
+        """测试其他线程已重新认证时，不再重复登录而直接重试"""
+        from src.fsoa.data.metabase import MetabaseClient
+
+        client = MetabaseClient("https://metabase.example.com", "user", "pass")
+        client.session_token = "expired"
+
+        ok = Mock(status_code=200)
+        ok.json.return_value = {"data": {"cols": [{"name": "test"}], "rows": [[1]]}}
+
+        responses = iter([Mock(status_code=401), ok])
+
+        def post(*args, **kwargs):
+            response = next(responses)
+            if response.status_code == 401:
+                # 本请求返回401时，其他线程已完成重新认证
+                client.session_token = "fresh"
+            return response
+
+        with patch.object(client.session, 'post', side_effect=post) as mock_post, \
+             patch.object(client, 'authenticate', return_value=True) as mock_auth:
+            result = client.query_database("SELECT 1 as test")
+
+        assert result == [{"test": 1}]
+        mock_auth.assert_not_called()
+        assert mock_post.call_count == 2
+
+    def test_reload_config_recreates_client(self):
+        """测试重新加载配置后重新创建Metabase客户端"""
+        import os
+        from src.fsoa.data.metabase import get_metabase_client
+        from src.fsoa.utils import config
+
+        with patch('src.fsoa.data.metabase.MetabaseClient', side_effect=lambda **kwargs: object()):
+            get_metabase_client.cache_clear()
+            first = get_metabase_client()
+            assert get_metabase_client() is first
+
+            with patch.dict(os.environ), patch('src.fsoa.utils.config.load_dotenv'):
+                config.reload_config()
+            assert get_metabase_client() is not first
+
+        get_metabase_client.cache_clear()
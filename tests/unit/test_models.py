@@ -131,3 +131,58 @@ class TestDecisionResult:
         
         with pytest.raises(ValidationError):
             DecisionResult(action="notify", confidence=-0.1)
+
+
+class TestOpportunityInfo:
+    """测试商机模型"""
+
+    def test_update_overdue_info_with_preloaded_sla_config(self):
+        """测试传入预读取的SLA配置时不逐个查询数据库"""
+        from unittest.mock import patch
+        from src.fsoa.data.models import OpportunityInfo, OpportunityStatus
+
+        opportunity = OpportunityInfo(
+            order_num="GD20250001",
+            name="张三",
+            address="北京市朝阳区",
+            supervisor_name="李四",
+            create_time=datetime.now(),
+            org_name="测试公司A",
+            order_status=OpportunityStatus.PENDING_APPOINTMENT,
+            elapsed_hours=5.0
+        )
+        sla_config = {"sla_pending_reminder": "2", "sla_pending_escalation": "4"}
+
+        with patch('src.fsoa.data.database.get_database_manager') as mock_get_db:
+            opportunity.update_overdue_info(sla_config=sla_config)
+
+        mock_get_db.assert_not_called()
+        assert opportunity.is_violation is True
+        assert opportunity.is_overdue is True
+        assert opportunity.sla_threshold_hours == 4
+        assert opportunity.overdue_hours == 1.0
+
+
+class TestNotificationTask:
+    """测试NotificationTask模型"""
+
+    def test_should_send_now_uses_given_timestamp(self):
+        """测试批量判断时使用传入的同一时间戳"""
+        from datetime import timedelta
+        from src.fsoa.data.models import NotificationTask, NotificationTaskType
+
+        now = datetime.now()
+        retry_task = NotificationTask(
+            order_num="GD20250001",
+            org_name="测试公司A",
+            notification_type=NotificationTaskType.REMINDER,
+            due_time=now - timedelta(hours=3),
+            retry_count=1,
+            last_sent_at=now - timedelta(hours=1),
+            cooldown_hours=2.0
+        )
+
+        assert retry_task.should_send_now(now) is False
+        assert retry_task.should_send_now(now + timedelta(hours=2)) is True
+        retry_task.retry_count = retry_task.max_retry_count
+        assert retry_task.should_send_now(now + timedelta(hours=2)) is False
@@ -2,6 +2,7 @@
 工具函数测试
 """
 
+import os
 import pytest
 from unittest.mock import patch, Mock
 from datetime import datetime, timedelta
@@ -85,24 +86,6 @@ class TestSendNotification:
         pass
 
 
-class TestUpdateTaskStatus:
-    """测试任务状态更新 - 已废弃功能的兼容性测试"""
-
-    @pytest.mark.skip(reason="TaskInfo已废弃，需要重构")
-    def test_update_task_status_deprecated(self):
-        """测试废弃的任务状态更新功能 - 需要重构"""
-        pass
-
-    def test_update_task_status_not_found(self):
-        """测试任务不存在的情况 - 废弃功能"""
-        # Act - 调用已废弃的函数
-        from src.fsoa.agent.tools import update_task_status
-        result = update_task_status(9999, "completed")
-
-        # Assert - 废弃的函数应该返回 False
-        assert result is False
-
-
 class TestSystemHealth:
     """测试系统健康检查"""
     
@@ -160,3 +143,211 @@ class TestSystemHealth:
         
         # Assert
         assert health["overall_status"] == "unhealthy"
+
+    @patch('src.fsoa.agent.tools.test_deepseek_connection')
+    @patch('src.fsoa.agent.tools.test_metabase_connection')
+    @patch('src.fsoa.agent.tools.test_wechat_webhook')
+    @patch('src.fsoa.agent.tools.get_db_manager')
+    def test_get_system_health_reuses_successful_probes(self, mock_db_manager, mock_test_wechat,
+                                                         mock_test_metabase, mock_test_deepseek):
+        """测试TTL内重复健康检查复用成功的探测结果，失败的探测每次重新执行"""
+        mock_test_metabase.return_value = True
+        mock_test_wechat.return_value = False
+        mock_test_deepseek.return_value = True
+        mock_db_manager.return_value = Mock()
+
+        get_system_health()
+        health = get_system_health()
+
+        assert health["metabase_connection"] is True
+        assert health["wechat_webhook"] is False
+        assert mock_test_metabase.call_count == 1
+        assert mock_test_deepseek.call_count == 1
+        assert mock_test_wechat.call_count == 2
+
+    @patch('src.fsoa.agent.tools.test_deepseek_connection')
+    @patch('src.fsoa.agent.tools.test_metabase_connection')
+    @patch('src.fsoa.agent.tools.test_wechat_webhook')
+    @patch('src.fsoa.agent.tools.get_db_manager')
+    def test_config_change_invalidates_cached_probes(self, mock_db_manager, mock_test_wechat,
+                                                      mock_test_metabase, mock_test_deepseek):
+        """测试重新加载配置或重置单例后，已缓存的成功探测结果失效并重新探测"""
+        from src.fsoa.agent import tools
+        from src.fsoa.utils import config
+
+        mock_test_metabase.return_value = True
+        mock_test_wechat.return_value = True
+        mock_test_deepseek.return_value = True
+        mock_db_manager.return_value = Mock()
+
+        get_system_health()
+        with patch.dict(os.environ), patch('src.fsoa.utils.config.load_dotenv'):
+            config.reload_config()
+        mock_test_metabase.return_value = False
+        health = get_system_health()
+
+        assert health["metabase_connection"] is False
+        assert mock_test_metabase.call_count == 2
+
+        tools.reset_singletons()
+        get_system_health()
+        assert mock_test_wechat.call_count == 3
+
+
+class TestRetryOnFailure:
+    """测试重试装饰器"""
+
+    def test_async_retry_uses_asyncio_sleep(self):
+        """测试协程函数重试时使用asyncio.sleep退避，不阻塞事件循环"""
+        import asyncio
+        from src.fsoa.agent.tools import retry_on_failure
+
+        attempts = []
+
+        @retry_on_failure(max_retries=3, delay=0.5)
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("webhook unavailable")
+            return "ok"
+
+        with patch('src.fsoa.agent.tools.asyncio.sleep') as mock_async_sleep, \
+             patch('src.fsoa.agent.tools.time.sleep') as mock_sleep:
+            async def no_wait(seconds):
+                return None
+            mock_async_sleep.side_effect = no_wait
+
+            result = asyncio.run(flaky())
+
+        assert result == "ok"
+        assert len(attempts) == 3
+        assert [c.args[0] for c in mock_async_sleep.call_args_list] == [0.5, 1.0]
+        mock_sleep.assert_not_called()
+
+    def test_rejects_non_positive_max_retries(self):
+        """测试max_retries小于1时在装饰时报错，而不是调用时抛出None"""
+        from src.fsoa.agent.tools import retry_on_failure
+
+        with pytest.raises(ValueError):
+            retry_on_failure(max_retries=0)
+
+    def test_non_retryable_exception_raised_immediately(self):
+        """测试不在exceptions范围内的异常不重试，直接抛出"""
+        from src.fsoa.agent.tools import retry_on_failure
+
+        attempts = []
+
+        @retry_on_failure(max_retries=3, delay=0.5, exceptions=(ConnectionError,))
+        def send():
+            attempts.append(1)
+            raise ValueError("invalid payload")
+
+        with patch('src.fsoa.agent.tools.time.sleep') as mock_sleep:
+            with pytest.raises(ValueError):
+                send()
+
+        assert len(attempts) == 1
+        mock_sleep.assert_not_called()
+
+
+class TestOpportunityStatistics:
+    """测试商机统计"""
+
+    @patch('src.fsoa.agent.tools.get_data_strategy')
+    def test_get_opportunity_statistics_breakdown(self, mock_data_strategy, multiple_opportunities):
+        """测试按组织与状态的统计分布"""
+        from src.fsoa.agent.tools import get_opportunity_statistics
+
+        overdue = [multiple_opportunities[0], multiple_opportunities[2]]
+        for opp in overdue:
+            opp.is_overdue = True
+        multiple_opportunities[2].escalation_level = 1
+
+        mock_strategy = Mock()
+        mock_strategy.get_opportunities.return_value = multiple_opportunities
+        mock_data_strategy.return_value = mock_strategy
+
+        stats = get_opportunity_statistics()
+
+        assert stats["total_opportunities"] == 3
+        assert stats["overdue_count"] == 2
+        assert stats["normal_count"] == 1
+        assert stats["escalation_count"] == 1
+        assert stats["organization_count"] == 3
+        assert stats["organization_breakdown"]["测试公司A"] == {"total": 1, "overdue": 1, "normal": 0}
+        assert stats["organization_breakdown"]["测试公司B"] == {"total": 1, "overdue": 0, "normal": 1}
+        assert stats["status_breakdown"] == {"待预约": 2, "暂不上门": 1}
+        mock_strategy.get_opportunities.assert_called_once()
+        mock_strategy.get_overdue_opportunities.assert_not_called()
+
+    @patch('src.fsoa.agent.tools.get_data_strategy')
+    def test_get_data_statistics_unavailable_without_snapshot(self, mock_data_strategy):
+        """测试没有快照（缓存未启用或为空）时返回标记为不可用的空统计，不拉取Metabase"""
+        from src.fsoa.agent.tools import get_data_statistics
+
+        mock_strategy = Mock()
+        mock_strategy.get_cache_statistics.return_value = {"cache_enabled": False}
+        mock_strategy.get_statistics_snapshot.return_value = None
+        mock_data_strategy.return_value = mock_strategy
+
+        stats = get_data_statistics()
+
+        mock_strategy.get_opportunities.assert_not_called()
+        assert stats["statistics_available"] is False
+        assert stats["total_opportunities"] == 0
+        assert stats["last_updated"] is None
+
+    @patch('src.fsoa.agent.tools.get_data_strategy')
+    def test_get_data_statistics_uses_snapshot(self, mock_data_strategy):
+        """测试有快照时直接返回快照中的统计"""
+        from src.fsoa.agent.tools import get_data_statistics
+
+        mock_strategy = Mock()
+        mock_strategy.get_cache_statistics.return_value = {"cache_enabled": True}
+        mock_strategy.get_statistics_snapshot.return_value = {
+            "total_opportunities": 3, "overdue_opportunities": 2, "escalation_opportunities": 1,
+            "organizations": 2, "snapshot_time": datetime(2025, 1, 1, 9, 0)
+        }
+        mock_data_strategy.return_value = mock_strategy
+
+        stats = get_data_statistics()
+
+        mock_strategy.get_statistics_snapshot.assert_called_once_with(build_from_cache=True)
+        mock_strategy.get_opportunities.assert_not_called()
+        assert stats["statistics_available"] is True
+        assert stats["total_opportunities"] == 3
+        assert stats["last_updated"] == datetime(2025, 1, 1, 9, 0)
+
+
+class TestResetSingletons:
+    """测试单例重置"""
+
+    def test_reset_singletons_clears_cached_factories(self):
+        """测试重置后各工厂函数重新创建实例"""
+        from src.fsoa.agent import tools
+
+        with patch('src.fsoa.agent.tools.BusinessDataStrategy', side_effect=lambda: object()):
+            tools.get_data_strategy.cache_clear()
+            first = tools.get_data_strategy()
+            assert tools.get_data_strategy() is first
+
+            tools.reset_singletons()
+            assert tools.get_data_strategy() is not first
+
+        tools.reset_singletons()
+        for factory in (tools.get_config, tools.get_metabase_client, tools.get_data_strategy,
+                        tools.get_notification_manager, tools.get_execution_tracker):
+            assert factory.cache_info().currsize == 0
+
+    def test_reset_managers_keeps_config(self):
+        """测试只重置管理器实例，不影响配置缓存"""
+        from src.fsoa.agent import tools
+
+        config = tools.get_config()
+        with patch('src.fsoa.agent.tools.AgentExecutionTracker', side_effect=lambda: object()):
+            tracker = tools.get_execution_tracker()
+            tools.reset_managers()
+            assert tools.get_execution_tracker() is not tracker
+
+        assert tools.get_config() is config
+        tools.reset_managers()
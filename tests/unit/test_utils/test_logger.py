@@ -0,0 +1,45 @@
+"""
+日志工具测试
+"""
+
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from src.fsoa.utils.logger import log_function_call
+
+
+def sample_tool(value):
+    """示例工具函数"""
+    if value < 0:
+        raise ValueError("negative")
+    return value * 2
+
+
+class TestLogFunctionCall:
+    """测试函数调用日志装饰器"""
+
+    def test_preserves_function_metadata(self):
+        """测试装饰后保留原函数名与文档"""
+        wrapped = log_function_call(sample_tool)
+
+        assert wrapped.__name__ == "sample_tool"
+        assert wrapped.__doc__ == "示例工具函数"
+
+    def test_skips_call_logging_when_info_disabled(self):
+        """测试INFO级别未启用时不记录调用日志，但仍记录异常"""
+        module_logger = logging.getLogger(__name__)
+        original_level = module_logger.level
+        module_logger.setLevel(logging.WARNING)
+        try:
+            with patch('src.fsoa.utils.logger.get_logger') as mock_get_logger:
+                wrapped = log_function_call(sample_tool)
+                assert wrapped(2) == 4
+                mock_get_logger.return_value.info.assert_not_called()
+
+                with pytest.raises(ValueError):
+                    wrapped(-1)
+                mock_get_logger.return_value.error.assert_called_once()
+        finally:
+            module_logger.setLevel(original_level)